@@ -0,0 +1,317 @@
+"""
+bulk_loader.py
+
+Bounded producer/consumer engine for chunked ArangoDB bulk imports.
+
+Producers call `add(collection, doc)` from a single thread (typically while
+parsing a source file). Documents are grouped per collection into chunks of
+`batch_size`; each full chunk is put on a bounded queue and imported by a
+pool of worker threads via `import_bulk`, so several collections load at
+once. When the queue is full the producer blocks, so peak memory is roughly
+`(queue_size + workers + open chunks) * batch_size` documents regardless of
+how large the dataset is, and parsing overlaps with network I/O.
+
+Chunks that fail with a transient error (connection reset, 5xx, timeout) are
+retried with exponential backoff; any other error (4xx, or a bug such as a
+TypeError) fails immediately. Give the workers a connection each by building
+the client with `pooled_client()`, which also turns off the HTTP adapter's own
+retries so a chunk is attempted at most `retries + 1` times.
+
+With `transaction_size=N` the importer instead groups documents from all
+collections into units of about N documents and writes each unit inside one
+ArangoDB stream transaction (`insert_many` per collection, then commit), so
+readers see a unit either completely or not at all; a rejected document
+aborts its unit and fails the load. A unit is only cut at a
+`boundary()` call, which the producer places between logical records (e.g.
+before each party, so a party and its type edge always commit together).
+`stream_transaction()` gives one-off writers the same guarantee.
+
+Usage:
+    client = pooled_client(ARANGO_ENDPOINT, workers=4)
+    db = client.db(...)
+    with BulkImporter(db, batch_size=5000, workers=4) as importer:
+        for doc in docs:
+            importer.add("Person", doc)
+    print(importer.report())
+
+    with BulkImporter(db, transaction_size=10000) as importer:
+        for party, type_edge in records:
+            importer.boundary()
+            importer.add("Person", party)
+            importer.add("type", type_edge)
+"""
+
+from __future__ import annotations
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+_STOP = object()
+
+
+def pooled_client(hosts, workers: int, request_timeout: float = 120):
+    """ArangoClient whose HTTP connection pool holds one connection per import worker.
+
+    The pool does not retry on its own (DefaultHTTPClient defaults to 3
+    attempts); BulkImporter's backoff is the only retry layer.
+    """
+    from arango import ArangoClient
+    from arango.http import DefaultHTTPClient
+
+    size = max(10, workers)
+    http_client = DefaultHTTPClient(
+        request_timeout=request_timeout, pool_connections=size, pool_maxsize=size,
+        retry_attempts=0,
+    )
+    return ArangoClient(hosts=hosts, http_client=http_client)
+
+
+@contextmanager
+def stream_transaction(db, write: Iterable[str], **options) -> Iterator[Any]:
+    """Yield a stream-transaction database; commit on success, abort on error.
+
+    Only the document API and AQL take part in a stream transaction, so write
+    through `insert_many`/`aql.execute` on the yielded database, not
+    `import_bulk`.
+    """
+    txn = db.begin_transaction(write=list(write), **options)
+    try:
+        yield txn
+        txn.commit_transaction()
+    except BaseException:
+        try:
+            txn.abort_transaction()
+        except Exception:
+            pass  # the original error matters more; the server expires the transaction
+        raise
+
+
+def _is_retryable(e: BaseException) -> bool:
+    """True for transient failures only: lost connections, timeouts and 5xx responses."""
+    from requests.exceptions import ConnectionError as RequestsConnectionError, Timeout
+
+    code = getattr(e, "http_code", None)
+    if isinstance(code, int):
+        return code >= 500
+    # python-arango raises ConnectionAbortedError once every host has failed.
+    return isinstance(e, (ConnectionError, TimeoutError, RequestsConnectionError, Timeout))
+
+
+class BulkImporter:
+    def __init__(
+        self,
+        db,
+        batch_size: int = 5000,
+        workers: int = 4,
+        queue_size: Optional[int] = None,
+        on_duplicate: str = "replace",
+        retries: int = 3,
+        backoff: float = 1.0,
+        transaction_size: int = 0,
+    ) -> None:
+        self.db = db
+        self.batch_size = max(1, batch_size)
+        self.on_duplicate = on_duplicate
+        self.retries = max(0, retries)
+        self.backoff = backoff
+        self.transaction_size = max(0, transaction_size)
+        self.transactions = 0
+        self.counts: Dict[str, int] = {}
+        self.stats: Dict[str, Dict[str, float]] = {}  # collection -> chunks/retries/errors/seconds
+        self._batches: Dict[str, List[Dict[str, Any]]] = {}
+        self._unit: Dict[str, List[Dict[str, Any]]] = {}  # transaction being assembled
+        self._unit_docs = 0
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size or 2 * max(1, workers))
+        self._errors: List[BaseException] = []
+        self._lock = threading.Lock()
+        self._started = time.perf_counter()
+        self._elapsed: Optional[float] = None
+        self._threads = [
+            threading.Thread(target=self._worker, name=f"bulk-import-{i}", daemon=True)
+            for i in range(max(1, workers))
+        ]
+        for t in self._threads:
+            t.start()
+
+    # ------------------------------------------------------------------
+    # Producer side
+    # ------------------------------------------------------------------
+    def add(self, collection: str, doc: Dict[str, Any]) -> None:
+        if self.transaction_size:
+            self._unit.setdefault(collection, []).append(doc)
+            self._unit_docs += 1
+            return
+        batch = self._batches.setdefault(collection, [])
+        batch.append(doc)
+        if len(batch) >= self.batch_size:
+            self._submit(collection)
+
+    def boundary(self) -> None:
+        """Mark a point between logical records where a transaction may be cut.
+
+        No-op unless transaction_size is set.
+        """
+        if self.transaction_size and self._unit_docs >= self.transaction_size:
+            self._submit_unit()
+
+    def flush(self) -> None:
+        """Submit every partially filled batch (and the open transaction unit)."""
+        if self._unit_docs:
+            self._submit_unit()
+        for collection in list(self._batches):
+            if self._batches[collection]:
+                self._submit(collection)
+
+    def drain(self) -> None:
+        """Flush and wait until everything added so far is written; workers keep running."""
+        self.flush()
+        self._queue.join()
+        if self._errors:
+            raise self._errors[0]
+
+    def close(self) -> None:
+        """Flush, wait for all imports to finish, and raise the first worker error."""
+        try:
+            self.flush()
+        finally:
+            self._stop_workers()
+        if self._errors:
+            raise self._errors[0]
+
+    def __enter__(self) -> "BulkImporter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+            return
+        # Producer failed: stop the workers without masking the original error.
+        self._stop_workers()
+
+    def _stop_workers(self) -> None:
+        for _ in self._threads:
+            self._queue.put(_STOP)
+        for t in self._threads:
+            t.join()
+        if self._elapsed is None:
+            self._elapsed = time.perf_counter() - self._started
+
+    def _submit(self, collection: str) -> None:
+        if self._errors:
+            raise self._errors[0]
+        docs = self._batches.pop(collection)
+        self._queue.put((collection, docs))
+
+    def _submit_unit(self) -> None:
+        if self._errors:
+            raise self._errors[0]
+        unit, self._unit, self._unit_docs = self._unit, {}, 0
+        self._queue.put((None, unit))
+
+    # ------------------------------------------------------------------
+    # Reporting
+    # ------------------------------------------------------------------
+    def report(self) -> str:
+        """Per-collection documents, chunks, retries and docs/s over the importer's lifetime."""
+        elapsed = self._elapsed if self._elapsed is not None else time.perf_counter() - self._started
+        lines = []
+        for col in sorted(self.counts):
+            st = self.stats[col]
+            line = (f"  {col}: {self.counts[col]} docs in {int(st['chunks'])} chunks, "
+                    f"{self.counts[col] / st['seconds']:,.0f} docs/s per request"
+                    if st["seconds"] > 0 else f"  {col}: {self.counts[col]} docs")
+            if st["retries"]:
+                line += f", {int(st['retries'])} retries"
+            if st["errors"]:
+                line += f", {int(st['errors'])} rejected"
+            lines.append(line)
+        total = sum(self.counts.values())
+        if self.transactions:
+            lines.append(f"  {self.transactions} stream transactions of up to "
+                         f"~{self.transaction_size} docs")
+        if elapsed > 0:
+            lines.append(f"  total: {total} docs in {elapsed:.1f}s ({total / elapsed:,.0f} docs/s)")
+        return "\n".join(lines)
+
+    # ------------------------------------------------------------------
+    # Consumer side
+    # ------------------------------------------------------------------
+    def _worker(self) -> None:
+        while True:
+            item = self._queue.get()
+            try:
+                if item is _STOP:
+                    return
+                if self._errors:
+                    continue  # drain so a blocked producer can reach close()
+                collection, docs = item
+                if collection is None:
+                    self._write_transaction(docs)
+                else:
+                    self._import_chunk(collection, docs)
+            except BaseException as e:  # surfaced to the producer via close()/add()
+                self._errors.append(e)
+            finally:
+                self._queue.task_done()
+
+    def _import_chunk(self, collection: str, docs: List[Dict[str, Any]]) -> None:
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                result = self.db.collection(collection).import_bulk(
+                    docs, overwrite=False, on_duplicate=self.on_duplicate
+                )
+                break
+            except Exception as e:
+                if attempt >= self.retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        elapsed = time.perf_counter() - start
+        rejected = result.get("errors", 0) if isinstance(result, dict) else 0
+        with self._lock:
+            self._record(collection, len(docs), attempt, rejected, elapsed)
+
+    def _write_transaction(self, unit: Dict[str, List[Dict[str, Any]]]) -> None:
+        """Write one unit atomically; a failed attempt is aborted and retried whole.
+
+        A rejected document raises instead of being counted, so the unit is
+        aborted and no party is committed without its type edge.
+        """
+        overwrite_mode = None if self.on_duplicate == "error" else self.on_duplicate
+        attempt = 0
+        while True:
+            start = time.perf_counter()
+            try:
+                with stream_transaction(self.db, write=unit) as txn:
+                    for col, docs in unit.items():
+                        txn.collection(col).insert_many(docs, overwrite_mode=overwrite_mode,
+                                                        raise_on_document_error=True)
+                break
+            except Exception as e:
+                if attempt >= self.retries or not _is_retryable(e):
+                    raise
+                attempt += 1
+                time.sleep(self.backoff * 2 ** (attempt - 1))
+        elapsed = time.perf_counter() - start
+        total = sum(len(docs) for docs in unit.values())
+        with self._lock:
+            self.transactions += 1
+            for col, docs in unit.items():
+                # Split the transaction's wall time by document share.
+                self._record(col, len(docs), attempt, 0, elapsed * len(docs) / total)
+
+    def _record(self, collection: str, docs: int, retries: int, rejected: int,
+                seconds: float) -> None:
+        self.counts[collection] = self.counts.get(collection, 0) + docs
+        st = self.stats.setdefault(
+            collection, {"chunks": 0, "retries": 0, "errors": 0, "seconds": 0.0}
+        )
+        st["chunks"] += 1
+        st["retries"] += retries
+        st["errors"] += rejected
+        st["seconds"] += seconds
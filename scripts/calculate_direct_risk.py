@@ -1,8 +1,19 @@
+import argparse
+import csv
+import json
 import os
+import sys
+from array import array
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from pathlib import Path
 import lxml.etree as etree
 from dotenv import load_dotenv
 from arango import ArangoClient
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import file_fingerprint, find_xml_source, open_xml_source
+
 # Load environment variables
 load_dotenv()
 
@@ -11,8 +22,11 @@ ARANGO_USERNAME = os.getenv("ARANGO_USERNAME", "root")
 ARANGO_PASSWORD = os.getenv("ARANGO_PASSWORD")
 ARANGO_DATABASE = os.getenv("ARANGO_DATABASE", "risk-intelligence")
 
-# File paths
+# File paths (.gz/.xz/.zip copies of the XML are accepted too)
 XML_PATH = "data/SDN_ADVANCED.XML"
+# Written by flatten_ofac.py in the same pass as parties/relationships, so the
+# XML normally does not need to be parsed again here.
+SANCTIONS_ENTRIES_CSV = "data/sanctions_entries.csv"
 
 # Weight Mappings based on ListID
 WEIGHTS = {
@@ -33,24 +47,192 @@ LIST_NAMES = {
     "91243": "OFAC Non-SDN Palestinian",
 }
 
-def calculate_direct_risk():
-    client = ArangoClient(hosts=ARANGO_ENDPOINT)
-    db = client.db(ARANGO_DATABASE, username=ARANGO_USERNAME, password=ARANGO_PASSWORD)
-    
-    print(f"Parsing {XML_PATH} for risk scoring...")
-    
-    # Store ProfileID -> Score, and ProfileID -> set of source list names
+def sanctions_source(xml_path=None):
+    """The file iter_sanctions_entries reads: the flattened sanctions_entries.csv
+    when present and at least as new as the XML, otherwise the XML itself."""
+    xml_path = xml_path or find_xml_source(XML_PATH)
+    csv_fresh = os.path.exists(SANCTIONS_ENTRIES_CSV) and not (
+        os.path.exists(xml_path)
+        and os.path.getmtime(xml_path) > os.path.getmtime(SANCTIONS_ENTRIES_CSV)
+    )
+    return SANCTIONS_ENTRIES_CSV if csv_fresh else xml_path
+
+def iter_sanctions_entries(xml_path=None):
+    """Yield (profile_id, list_id) pairs for every OFAC SanctionsEntry.
+
+    Reads the flattened sanctions_entries.csv when present and at least as new
+    as the XML; otherwise falls back to streaming the XML, so a freshly
+    downloaded list is never scored from a stale flatten.
+    """
+    xml_path = xml_path or find_xml_source(XML_PATH)
+    if sanctions_source(xml_path) == SANCTIONS_ENTRIES_CSV:
+        print(f"Reading {SANCTIONS_ENTRIES_CSV} for risk scoring...")
+        with open(SANCTIONS_ENTRIES_CSV, 'r', encoding='utf-8') as f:
+            for row in csv.DictReader(f):
+                yield str(row["profile_id"]), str(row["list_id"])
+        return
+
+    print(f"{SANCTIONS_ENTRIES_CSV} missing or stale — parsing {xml_path} for risk scoring "
+          f"(run flatten_ofac.py to avoid this).")
+    with open_xml_source(xml_path) as source:
+        context = etree.iterparse(source, events=('end',), tag='{*}SanctionsEntry')
+        for event, elem in context:
+            yield str(elem.get("ProfileID")), str(elem.get("ListID"))
+            elem.clear()
+            while elem.getprevious() is not None:
+                del elem.getparent()[0]
+
+# Temporary collection the --server-join mode stages risk_map/source_map in.
+STAGING_COLLECTION = "DirectRiskStaging"
+STAGING_BATCH_SIZE = 10000
+
+# Change report written by --changed-only for downstream incremental stages.
+DIRECT_RISK_DIFF_PATH = "data/direct_risk_diff.json"
+DIFF_CATEGORIES = ("newly_listed", "delisted", "score_up", "score_down", "sources_changed")
+
+VERTEX_COLLECTIONS = ["Person", "Organization", "Vessel", "Aircraft"]
+
+# ---------------------------------------------------------------------------
+# Risk map cache
+# ---------------------------------------------------------------------------
+
+# risk_map/source_map of one sanctions source (the CSV or XML that
+# sanctions_source() picks), keyed by its content hash: a JSON header line,
+# then the sorted numeric ProfileIDs (uint64), their scores (float32) and a
+# bitmask (uint32) over the header's list names, all little-endian.
+RISK_CACHE_DIR = "data/cache"
+RISK_CACHE_VERSION = 1
+
+# Remembers the digest of each source by (size, mtime) so an untouched file is not re-hashed.
+SOURCE_DIGESTS_PATH = os.path.join(RISK_CACHE_DIR, "source_digests.json")
+
+def _source_digest(path):
+    st = os.stat(path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    key = os.path.abspath(path)
+    try:
+        with open(SOURCE_DIGESTS_PATH, encoding="utf-8") as f:
+            known = json.load(f)
+    except (OSError, ValueError):
+        known = {}
+    if known.get(key, {}).get("stamp") == stamp:
+        return known[key]["digest"]
+    digest = file_fingerprint(path)["blake2b"]
+    known[key] = {"stamp": stamp, "digest": digest}
+    os.makedirs(RISK_CACHE_DIR, exist_ok=True)
+    with open(SOURCE_DIGESTS_PATH, "w", encoding="utf-8") as f:
+        json.dump(known, f, indent=1)
+    return digest
+
+def _risk_cache_path(digest):
+    return os.path.join(RISK_CACHE_DIR, f"risk_map-{digest}.bin")
+
+def _cache_signature():
+    """Scoring tables the cached maps were derived with; a change invalidates them."""
+    return {"weights": WEIGHTS, "list_names": LIST_NAMES}
+
+def _is_int_id(pid):
+    return pid.isascii() and pid.isdigit() and (pid == "0" or pid[0] != "0") and int(pid) < 1 << 64
+
+def _little_endian(arr):
+    if sys.byteorder != "little":
+        arr = array(arr.typecode, arr)
+        arr.byteswap()
+    return arr
+
+def save_risk_cache(digest, risk_map, source_map):
+    names = sorted(set().union(*source_map.values())) if source_map else []
+    if len(names) > 32:
+        print(f"  [SKIP] risk map cache not written ({len(names)} source lists exceed the 32-bit mask)")
+        return None
+    bit = {name: 1 << i for i, name in enumerate(names)}
+
+    def _mask(pid):
+        return sum(bit[name] for name in source_map.get(pid, ()))
+
+    int_ids = sorted(int(pid) for pid in risk_map if _is_int_id(pid))
+    ids = array("Q", int_ids)
+    scores = array("f", (risk_map[str(i)] for i in int_ids))
+    masks = array("I", (_mask(str(i)) for i in int_ids))
+    header = {
+        "version": RISK_CACHE_VERSION,
+        "digest": digest,
+        **_cache_signature(),
+        "source_names": names,
+        "count": len(ids),
+        # Rare non-numeric ProfileIDs: [id, score, mask]
+        "str_ids": sorted([pid, risk_map[pid], _mask(pid)] for pid in risk_map if not _is_int_id(pid)),
+    }
+    path = _risk_cache_path(digest)
+    os.makedirs(RISK_CACHE_DIR, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+        for arr in (ids, scores, masks):
+            _little_endian(arr).tofile(f)
+    os.replace(tmp, path)
+    # Maps of older XML files are never read again.
+    for name in os.listdir(RISK_CACHE_DIR):
+        if name.startswith("risk_map-") and name.endswith(".bin") and name != os.path.basename(path):
+            os.remove(os.path.join(RISK_CACHE_DIR, name))
+    return path
+
+def load_risk_cache(digest):
+    """(risk_map, source_map) cached for `digest`, or None if absent or stale."""
+    path = _risk_cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    with open(path, "rb") as f:
+        header = json.loads(f.readline())
+        if header.get("version") != RISK_CACHE_VERSION or header.get("digest") != digest:
+            return None
+        if {k: header.get(k) for k in _cache_signature()} != _cache_signature():
+            return None
+        arrays = []
+        for typecode in ("Q", "f", "I"):
+            arr = array(typecode)
+            arr.fromfile(f, header["count"])
+            arrays.append(_little_endian(arr))
+    names = header["source_names"]
+
+    def _sources(mask):
+        return {name for i, name in enumerate(names) if mask >> i & 1}
+
+    ids, scores, masks = arrays
+    keys = [str(pid) for pid in ids]
+    # Scores are list weights with at most a few decimals; rounding the float32
+    # restores the exact value a fresh parse would produce. Both scores and
+    # masks take only a handful of distinct values, so decode each once.
+    exact = {score: round(score, 6) for score in set(scores)}
+    lists = {mask: frozenset(_sources(mask)) for mask in set(masks)}
+    risk_map = dict(zip(keys, map(exact.__getitem__, scores)))
+    source_map = {key: set(lists[mask]) for key, mask in zip(keys, masks)}
+    for pid, score, mask in header["str_ids"]:
+        risk_map[pid] = score
+        source_map[pid] = _sources(mask)
+    return risk_map, source_map
+
+def build_risk_maps(xml_path=None):
+    """Return (risk_map, source_map): ProfileID -> score and ProfileID -> set of list names.
+
+    Served from the risk map cache when the content hash of the source that
+    would be read (see sanctions_source) matches a previous run; otherwise
+    parsed and cached.
+    """
+    xml_path = xml_path or find_xml_source(XML_PATH)
+    source = sanctions_source(xml_path)
+    digest = _source_digest(source) if os.path.exists(source) else None
+    if digest:
+        cached = load_risk_cache(digest)
+        if cached is not None:
+            print(f"Loaded risk map for {source} from {_risk_cache_path(digest)}.")
+            print(f"Found {len(cached[0])} unique profiles with direct risk metadata.")
+            return cached
+
     risk_map = {}
     source_map = {}
     
-    # Iterative parse for SanctionsEntry
-    context = etree.iterparse(XML_PATH, events=('end',), tag='{*}SanctionsEntry')
-    
-    count = 0
-    for event, elem in context:
-        profile_id = str(elem.get("ProfileID"))
-        list_id = str(elem.get("ListID"))
-        
+    for profile_id, list_id in iter_sanctions_entries(xml_path):
         # Determine score (default to 0.1 for trace visibility if not in weight map)
         score = WEIGHTS.get(list_id, 0.1)
         
@@ -62,18 +244,17 @@ def calculate_direct_risk():
         # more than one list).
         source_map.setdefault(profile_id, set()).add(LIST_NAMES.get(list_id, "OFAC Other"))
             
-        count += 1
-        elem.clear()
-        while elem.getprevious() is not None:
-            del elem.getparent()[0]
-            
     print(f"Found {len(risk_map)} unique profiles with direct risk metadata.")
+    if digest:
+        path = save_risk_cache(digest, risk_map, source_map)
+        if path:
+            print(f"Risk map cached to {path}")
+    return risk_map, source_map
 
-    # Apply updates to ArangoDB collections
-    collections = ["Person", "Organization", "Vessel", "Aircraft"]
+def _apply_client_side(db, risk_map, source_map):
     total_updated = 0
     
-    for coll_name in collections:
+    for coll_name in VERTEX_COLLECTIONS:
         if not db.has_collection(coll_name):
             continue
             
@@ -105,8 +286,157 @@ def calculate_direct_risk():
         if batch:
             db.collection(coll_name).update_many(batch)
             total_updated += len(batch)
+    return total_updated
+
+@contextmanager
+def _staged_risk(db, risk_map, source_map):
+    """Import risk_map/source_map into STAGING_COLLECTION (keyed by ProfileID) for
+    the duration of the block, then drop it."""
+    if db.has_collection(STAGING_COLLECTION):
+        db.delete_collection(STAGING_COLLECTION)
+    staging = db.create_collection(STAGING_COLLECTION)
+    try:
+        print(f"Staging {len(risk_map)} profiles in {STAGING_COLLECTION}...")
+        batch = []
+        for pid, score in risk_map.items():
+            # Never overwrite riskScore on synthetic parties — they self-declare it at load time
+            if pid.startswith("SYN-"):
+                continue
+            batch.append({"_key": pid, "riskScore": score,
+                          "sanctionsSources": sorted(source_map.get(pid, []))})
+            if len(batch) >= STAGING_BATCH_SIZE:
+                staging.import_bulk(batch, on_duplicate="replace")
+                batch = []
+        if batch:
+            staging.import_bulk(batch, on_duplicate="replace")
+        yield
+    finally:
+        db.delete_collection(STAGING_COLLECTION, ignore_missing=True)
+
+def _apply_server_join(db, risk_map, source_map):
+    """Stage risk_map/source_map once and update each collection with one AQL join.
+
+    The staged documents are keyed by ProfileID, so the join is a primary-index
+    lookup per staged entry and no entity keys travel to the client.
+    """
+    total_updated = 0
+    with _staged_risk(db, risk_map, source_map):
+        for coll_name in VERTEX_COLLECTIONS:
+            if not db.has_collection(coll_name):
+                continue
+            print(f"Updating risk scores for {coll_name} (server-side join)...")
+            total_updated += sum(db.aql.execute(
+                """FOR s IN @@staging
+                     FOR d IN @@col FILTER d._key == s._key
+                       UPDATE d WITH { riskScore: s.riskScore, sanctionsSources: s.sanctionsSources }
+                         IN @@col
+                       RETURN 1""",
+                bind_vars={"@staging": STAGING_COLLECTION, "@col": coll_name},
+            ))
+    return total_updated
+
+# Staged profiles whose stored score or source list differs; returns old and new values.
+_CHANGED_UPDATE = """
+FOR s IN @@staging
+  FOR d IN @@col FILTER d._key == s._key
+    FILTER d.riskScore != s.riskScore OR d.sanctionsSources != s.sanctionsSources
+    UPDATE d WITH { riskScore: s.riskScore, sanctionsSources: s.sanctionsSources } IN @@col
+    RETURN { _id: d._id, old: OLD.riskScore, new: s.riskScore,
+             oldSources: OLD.sanctionsSources, sources: s.sanctionsSources }
+"""
+
+# Entities scored by an earlier run that are no longer on any list: clear their score.
+_DELIST = """
+FOR d IN @@col
+  FILTER d.sanctionsSources != null AND NOT STARTS_WITH(d._key, "SYN-")
+  FILTER DOCUMENT(@staging, d._key) == null
+  UPDATE d WITH { riskScore: null, sanctionsSources: null } IN @@col OPTIONS { keepNull: false }
+  RETURN { _id: d._id, old: OLD.riskScore, oldSources: OLD.sanctionsSources }
+"""
+
+def _apply_changed_only(db, risk_map, source_map, diff_path=DIRECT_RISK_DIFF_PATH):
+    """Write only entities whose riskScore or sanctionsSources changed, clear
+    delisted ones, and save the changes to `diff_path` as JSON.
+
+    The diff lists `newly_listed`, `delisted`, `score_up`, `score_down` and
+    `sources_changed` (same score, different lists) entries by `_id`.
+    """
+    diff = {category: [] for category in DIFF_CATEGORIES}
+    with _staged_risk(db, risk_map, source_map):
+        for coll_name in VERTEX_COLLECTIONS:
+            if not db.has_collection(coll_name):
+                continue
+            print(f"Updating changed risk scores for {coll_name}...")
+            for row in db.aql.execute(_CHANGED_UPDATE, bind_vars={"@staging": STAGING_COLLECTION,
+                                                                  "@col": coll_name}):
+                if not row["oldSources"]:
+                    diff["newly_listed"].append({"_id": row["_id"], "riskScore": row["new"],
+                                                 "sanctionsSources": row["sources"]})
+                    continue
+                entry = {"_id": row["_id"], "from": row["old"], "to": row["new"],
+                         "fromSources": row["oldSources"], "sanctionsSources": row["sources"]}
+                if row["old"] is None or row["new"] > row["old"]:
+                    diff["score_up"].append(entry)
+                elif row["new"] < row["old"]:
+                    diff["score_down"].append(entry)
+                else:
+                    diff["sources_changed"].append(entry)
+            for row in db.aql.execute(_DELIST, bind_vars={"staging": STAGING_COLLECTION,
+                                                          "@col": coll_name}):
+                diff["delisted"].append({"_id": row["_id"], "from": row["old"],
+                                         "fromSources": row["oldSources"]})
+
+    for entries in diff.values():
+        entries.sort(key=lambda e: e["_id"])
+    counts = {category: len(entries) for category, entries in diff.items()}
+    os.makedirs(os.path.dirname(diff_path) or ".", exist_ok=True)
+    tmp = f"{diff_path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"generated_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+                   "counts": counts, **diff}, f, separators=(",", ":"))
+    os.replace(tmp, diff_path)
+    print("Direct risk changes: " + ", ".join(f"{n} {c.replace('_', ' ')}" for c, n in counts.items()))
+    print(f"Change report written to {diff_path}")
+    return sum(counts.values())
+
+def calculate_direct_risk(xml_path=None, server_join=False, changed_only=False,
+                          diff_path=DIRECT_RISK_DIFF_PATH):
+    client = ArangoClient(hosts=ARANGO_ENDPOINT)
+    db = client.db(ARANGO_DATABASE, username=ARANGO_USERNAME, password=ARANGO_PASSWORD)
+    
+    risk_map, source_map = build_risk_maps(xml_path)
+
+    # Apply updates to ArangoDB collections
+    if changed_only:
+        total_updated = _apply_changed_only(db, risk_map, source_map, diff_path)
+    elif server_join:
+        total_updated = _apply_server_join(db, risk_map, source_map)
+    else:
+        total_updated = _apply_client_side(db, risk_map, source_map)
 
     print(f"Successfully updated {total_updated} entities with direct risk scores.")
 
 if __name__ == "__main__":
-    calculate_direct_risk()
+    parser = argparse.ArgumentParser(description="Score direct sanctions risk from OFAC data")
+    parser.add_argument(
+        "--xml",
+        default=None,
+        help=f"OFAC XML used when {SANCTIONS_ENTRIES_CSV} is missing or stale: plain, .gz, .xz or .zip",
+    )
+    parser.add_argument(
+        "--server-join",
+        action="store_true",
+        help=f"Stage the scores in a temporary {STAGING_COLLECTION} collection and update "
+             "each vertex collection with one server-side AQL join",
+    )
+    parser.add_argument(
+        "--changed-only",
+        action="store_true",
+        help="Write only entities whose score or source lists changed (server-side), clear "
+             "delisted ones, and save the changes to --diff-out",
+    )
+    parser.add_argument("--diff-out", default=DIRECT_RISK_DIFF_PATH,
+                        help=f"Change report path for --changed-only (default: {DIRECT_RISK_DIFF_PATH})")
+    args = parser.parse_args()
+    calculate_direct_risk(xml_path=args.xml, server_join=args.server_join,
+                          changed_only=args.changed_only, diff_path=args.diff_out)
@@ -6,12 +6,20 @@ Adapted from fraud-intelligence for same-cluster / self-managed GAE compatibilit
 
 from __future__ import annotations
 
+import gzip
+import hashlib
+import json
+import lzma
 import os
 import re
+import sys
 import time
+import zipfile
+from contextlib import contextmanager
 from dataclasses import dataclass
+from datetime import datetime, timezone
 from pathlib import Path
-from typing import Dict, Optional
+from typing import Any, BinaryIO, Dict, Iterator, Optional
 from urllib.parse import urlparse, urlunparse
 
 
@@ -135,3 +143,201 @@ def apply_config_to_env(cfg: ArangoConfig) -> None:
     os.environ["ARANGO_PASSWORD"] = cfg.password
     os.environ["ARANGO_DATABASE"] = cfg.database
     os.environ["ARANGO_DB"] = cfg.database
+
+
+# Characters ArangoDB accepts in a document _key.
+_ARANGO_KEY_RE = re.compile(r"^[A-Za-z0-9_\-:.@()+,=;$!*'%]{1,254}$")
+
+
+def relationship_key(rel_id: Optional[str], from_party: str, to_party: str, rel_type: str) -> str:
+    """
+    Deterministic edge _key for a relationship: the OFAC ProfileRelationship ID
+    when there is one, else a digest of its endpoints and type (synthetic rows).
+    Reloading the same relationship then replaces the edge instead of adding one.
+    """
+    if rel_id and _ARANGO_KEY_RE.match(str(rel_id)):
+        return str(rel_id)
+    digest = hashlib.blake2b(f"{from_party}|{to_party}|{rel_type}".encode("utf-8"), digest_size=10)
+    return f"h-{digest.hexdigest()}"
+
+
+def type_edge_key(collection: str, key: str) -> str:
+    """Deterministic _key of an instance's type edge (one per instance)."""
+    return f"{collection}-{key}"
+
+
+def file_fingerprint(path: str, chunk_size: int = 1 << 20) -> Dict[str, Any]:
+    """
+    Content digest, size and line count of a file, read in one streaming pass.
+    Used to tell whether a pipeline input changed since it was last loaded.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    size = lines = 0
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+            size += len(chunk)
+            lines += chunk.count(b"\n")
+    return {"blake2b": digest.hexdigest(), "bytes": size, "lines": lines}
+
+
+# Compressed archives of the OFAC XML that open_xml_source() can stream.
+COMPRESSED_XML_SUFFIXES = (".gz", ".xz", ".zip")
+
+
+def is_compressed_xml(path: str) -> bool:
+    return path.lower().endswith(COMPRESSED_XML_SUFFIXES)
+
+
+def find_xml_source(path: str) -> str:
+    """
+    Return `path` if it exists, else the first compressed variant that does
+    (path.gz, path.xz, path.zip, or the same stem with .zip). Falls back to
+    `path` so callers report the expected location when nothing is found.
+    """
+    stem = os.path.splitext(path)[0]
+    for candidate in (path, f"{path}.gz", f"{path}.xz", f"{path}.zip", f"{stem}.zip", f"{stem}.ZIP"):
+        if os.path.exists(candidate):
+            return candidate
+    return path
+
+
+@contextmanager
+def open_xml_source(path: str) -> Iterator[BinaryIO]:
+    """
+    Open an XML file for streaming parsers, decompressing .gz/.xz/.zip on the fly.
+    For .zip archives the first *.xml member is used. Nothing is written to disk.
+    """
+    lower = path.lower()
+    if lower.endswith(".zip"):
+        with zipfile.ZipFile(path) as zf:
+            members = [n for n in zf.namelist() if n.lower().endswith(".xml")]
+            if not members:
+                raise ValueError(f"{path}: no .xml member in archive")
+            with zf.open(members[0]) as f:
+                yield f
+        return
+    if lower.endswith(".gz"):
+        opener = gzip.open
+    elif lower.endswith(".xz"):
+        opener = lzma.open
+    else:
+        opener = open
+    with opener(path, "rb") as f:
+        yield f
+
+
+# ---------------------------------------------------------------------------
+# Run instrumentation
+# ---------------------------------------------------------------------------
+
+# One JSON line per run is appended to METRICS_DIR/<run>.jsonl.
+METRICS_DIR = "data/metrics"
+
+
+def peak_rss_mb() -> Optional[float]:
+    """
+    Peak resident set size in MiB of this process or its largest reaped child
+    (e.g. process-pool parse workers). Returns None where `resource` is unavailable.
+    """
+    try:
+        import resource
+    except ImportError:  # Windows
+        return None
+    peak = max(
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss,
+    )
+    # ru_maxrss is bytes on macOS, KiB on Linux.
+    scale = 1024 * 1024 if sys.platform == "darwin" else 1024
+    return round(peak / scale, 1)
+
+
+class RunMetrics:
+    """
+    Stage timers, rate counters and peak-RSS samples for one script run.
+
+        metrics = RunMetrics("flatten_ofac")
+        with metrics.stage("parse"):
+            for row in rows:
+                metrics.count("parties")
+        metrics.write()
+
+    Counters belong to the innermost open stage. `write()` appends the summary
+    to METRICS_DIR/<run>.jsonl so successive runs can be compared.
+    """
+
+    def __init__(self, run: str, **context: Any) -> None:
+        self.run = run
+        self.context = context
+        self.started_at = datetime.now(timezone.utc)
+        self._t0 = time.perf_counter()
+        self._stages: Dict[str, Dict[str, Any]] = {}
+        self._open: list = []  # stack of (name, start time)
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator["RunMetrics"]:
+        entry = self._stages.setdefault(name, {"seconds": 0.0, "counts": {}})
+        start = time.perf_counter()
+        self._open.append((name, start))
+        try:
+            yield self
+        finally:
+            self._open.pop()
+            entry["seconds"] += time.perf_counter() - start
+            entry["peak_rss_mb"] = peak_rss_mb()
+
+    def count(self, key: str, n: int = 1) -> int:
+        """Add `n` to `key` in the current stage and return the new total."""
+        name = self._open[-1][0] if self._open else "run"
+        counts = self._stages.setdefault(name, {"seconds": 0.0, "counts": {}})["counts"]
+        counts[key] = counts.get(key, 0) + n
+        return counts[key]
+
+    def rate(self, key: str) -> float:
+        """Items/second for `key` in the current stage so far."""
+        if not self._open:
+            return 0.0
+        name, start = self._open[-1]
+        elapsed = time.perf_counter() - start
+        return self._stages[name]["counts"].get(key, 0) / elapsed if elapsed > 0 else 0.0
+
+    def summary(self) -> Dict[str, Any]:
+        stages = {}
+        for name, entry in self._stages.items():
+            seconds = entry["seconds"]
+            stages[name] = {
+                "seconds": round(seconds, 3),
+                "peak_rss_mb": entry.get("peak_rss_mb"),
+                "counts": dict(entry["counts"]),
+                "per_second": {
+                    k: round(v / seconds, 1) for k, v in entry["counts"].items() if seconds > 0
+                },
+            }
+        return {
+            "run": self.run,
+            "started_at": self.started_at.isoformat(timespec="seconds"),
+            "total_seconds": round(time.perf_counter() - self._t0, 3),
+            "peak_rss_mb": peak_rss_mb(),
+            **({"context": self.context} if self.context else {}),
+            "stages": stages,
+        }
+
+    def report(self) -> str:
+        """Human-readable one-line-per-stage table of the summary."""
+        s = self.summary()
+        lines = [f"Timings for {s['run']} ({s['total_seconds']:.1f}s, peak RSS {s['peak_rss_mb']} MiB):"]
+        for name, st in s["stages"].items():
+            rates = ", ".join(f"{k} {v:,.0f}/s" for k, v in st["per_second"].items())
+            lines.append(f"  {name:<16} {st['seconds']:9.2f}s" + (f"  {rates}" if rates else ""))
+        return "\n".join(lines)
+
+    def write(self, path: Optional[str] = None) -> str:
+        """Append the JSON summary to `path` (default METRICS_DIR/<run>.jsonl) and print the report."""
+        path = path or os.path.join(METRICS_DIR, f"{self.run}.jsonl")
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(self.summary(), separators=(",", ":")) + "\n")
+        print(self.report())
+        print(f"Run metrics appended to {path}")
+        return path
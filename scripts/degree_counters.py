@@ -0,0 +1,145 @@
+"""
+degree_counters.py
+
+Precomputed per-vertex degree counters for the relationship graph.
+
+Every Person/Organization/Vessel/Aircraft carries
+
+    degree:      {"owned_by": {"in": 2, "out": 1}, "leader_of": {...}, ...}
+    degreeTotal: 3   # sum over all relationship edge collections
+
+so anchor selection and supernode detection filter or sort on an indexed
+attribute (ri_degreeTotal, see provision_indexes.py) instead of counting
+edges per vertex at query time. Counts are taken with edge-index lookups on
+the server and only vertices whose counts changed are written.
+
+load_data.py refreshes every vertex after a full load and only the endpoints
+of changed edges after an incremental one; load_synthetic_data.py and
+generate_clean_portfolio.py refresh the vertices their edges touch.
+
+Run:
+    python scripts/degree_counters.py                  # recount every vertex
+    python scripts/degree_counters.py --supernodes 50  # list vertices with degree >= 50
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import apply_config_to_env, get_arango_config, load_dotenv, sanitize_url
+
+from arango import ArangoClient
+
+VERTEX_COLLECTIONS = ["Person", "Organization", "Vessel", "Aircraft"]
+EDGE_COLLECTIONS = ["owned_by", "family_member_of", "leader_of", "operates"]
+
+DEGREE_FIELD = "degree"
+DEGREE_TOTAL_FIELD = "degreeTotal"
+SUPERNODE_MIN_DEGREE = 50
+
+
+def _degree_expr(db) -> str:
+    """AQL object literal counting `d`'s in/out edges per relationship collection."""
+    parts = []
+    for col in EDGE_COLLECTIONS:
+        if db.has_collection(col):
+            parts.append(
+                f"{col}: {{ out: LENGTH(FOR e IN {col} FILTER e._from == d._id RETURN 1), "
+                f"in: LENGTH(FOR e IN {col} FILTER e._to == d._id RETURN 1) }}"
+            )
+    return "{ " + ", ".join(parts) + " }"
+
+
+def _update_clause(db) -> str:
+    return f"""
+        LET deg = {_degree_expr(db)}
+        LET total = SUM(FOR c IN ATTRIBUTES(deg) RETURN deg[c].out + deg[c].in)
+        FILTER d.{DEGREE_FIELD} != deg OR d.{DEGREE_TOTAL_FIELD} != total
+        UPDATE d WITH {{ {DEGREE_FIELD}: deg, {DEGREE_TOTAL_FIELD}: total }} IN @@col
+            OPTIONS {{ mergeObjects: false }}
+        RETURN 1"""
+
+
+def refresh_degrees(db, vertex_ids: Optional[Iterable[str]] = None, batch_size: int = 5000) -> int:
+    """Recount degrees and write the ones that changed; return how many were written.
+
+    With `vertex_ids` (e.g. the endpoints of inserted or removed edges) only
+    those vertices are recounted; ids outside VERTEX_COLLECTIONS or of missing
+    documents are ignored. Without it every vertex is recounted.
+    """
+    update = _update_clause(db)
+    written = 0
+    if vertex_ids is None:
+        for col in VERTEX_COLLECTIONS:
+            if db.has_collection(col):
+                written += sum(db.aql.execute(f"FOR d IN @@col {update}", bind_vars={"@col": col},
+                                              batch_size=10000, stream=True))
+        return written
+
+    by_col: Dict[str, List[str]] = {}
+    for vid in set(vertex_ids):
+        col, _, key = vid.partition("/")
+        if col in VERTEX_COLLECTIONS and key:
+            by_col.setdefault(col, []).append(vid)
+    for col, ids in by_col.items():
+        if not db.has_collection(col):
+            continue
+        ids.sort()
+        for i in range(0, len(ids), batch_size):
+            written += sum(db.aql.execute(
+                f"FOR d IN DOCUMENT(@ids) {update}",
+                bind_vars={"@col": col, "ids": ids[i:i + batch_size]},
+            ))
+    return written
+
+
+SUPERNODES_QUERY = f"""FOR d IN @@col
+    FILTER d.{DEGREE_TOTAL_FIELD} >= @min
+    SORT d.{DEGREE_TOTAL_FIELD} DESC LIMIT @limit
+    RETURN {{ _id: d._id, label: d.label, degreeTotal: d.{DEGREE_TOTAL_FIELD},
+              degree: d.{DEGREE_FIELD} }}"""
+
+
+def supernodes(db, min_degree: int = SUPERNODE_MIN_DEGREE, limit: int = 25) -> List[dict]:
+    """Vertices with at least `min_degree` relationship edges, highest first."""
+    out = []
+    for col in VERTEX_COLLECTIONS:
+        if db.has_collection(col):
+            out += db.aql.execute(
+                SUPERNODES_QUERY,
+                bind_vars={"@col": col, "min": min_degree, "limit": limit},
+            )
+    return sorted(out, key=lambda v: -v["degreeTotal"])[:limit]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Recount per-vertex degree counters")
+    parser.add_argument("--supernodes", type=int, metavar="MIN_DEGREE", default=None,
+                        help="Only list vertices with at least this many relationship edges")
+    args = parser.parse_args()
+
+    load_dotenv()
+    cfg = get_arango_config()
+    apply_config_to_env(cfg)
+    print(f"Connecting to ArangoDB ({cfg.mode}): {sanitize_url(cfg.url)}")
+    print(f"Database: {cfg.database}\n")
+    client = ArangoClient(hosts=cfg.url)
+    db = client.db(cfg.database, username=cfg.username, password=cfg.password)
+
+    if args.supernodes is not None:
+        for v in supernodes(db, args.supernodes):
+            per_type = ", ".join(f"{c} {d['in']}/{d['out']}" for c, d in sorted(v["degree"].items())
+                                 if d["in"] or d["out"])
+            print(f"  {v['degreeTotal']:>6}  {v['_id']:<28} {v['label']}  (in/out: {per_type})")
+        return
+
+    print("Recounting degrees for every vertex...")
+    print(f"  {refresh_degrees(db)} vertices updated")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+Micro-benchmark for the flattener's party field extraction.
+
+Compares, on the same XML:
+  legacy find()   per-party `.//{*}` wildcard descendant searches (pre-refactor)
+  start/end FSM   iterparse start+end events on Profile/Identity/NamePartValue
+                  with a primary-identity state machine
+  child steps     flatten_ofac.extract_rows (schema-anchored child steps)
+
+Two measurements are reported: full streaming passes (parse + extract, best of
+--repeat) and extraction alone on pre-parsed DistinctParty elements, which
+isolates the per-party cost from lxml's tokenising. All variants must produce
+identical rows; the script checks that before reporting timings.
+
+Run:
+    python scripts/dev/bench_flatten_extractor.py                 # data/SDN_ADVANCED.XML
+    python scripts/dev/bench_flatten_extractor.py path/to/file.xml --repeat 5
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+from lxml import etree
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from common import find_xml_source, open_xml_source
+from flatten_ofac import PARSE_TAGS, XML_PATH, _party_row, _clear, extract_rows
+
+FSM_TAGS = PARSE_TAGS + ("{*}Profile", "{*}Identity", "{*}NamePartValue")
+
+
+def _local(elem):
+    return etree.QName(elem).localname
+
+
+def _other_row(local, elem):
+    if local == "ProfileRelationship":
+        return [elem.get("ID"), elem.get("From-ProfileID"),
+                elem.get("To-ProfileID"), elem.get("RelationTypeID")]
+    return [elem.get("ProfileID"), elem.get("ListID")]
+
+
+def legacy_party_row(elem):
+    name_elem = elem.find(".//{*}Identity[@Primary='true']//{*}NamePartValue")
+    primary_name = name_elem.text if name_elem is not None else ""
+    sub_type_elem = elem.find(".//{*}Profile")
+    party_subtype_id = sub_type_elem.get("PartySubTypeID") if sub_type_elem is not None else ""
+    return [elem.get("FixedRef"), primary_name, party_subtype_id]
+
+
+def legacy_rows(xml_path):
+    with open_xml_source(xml_path) as source:
+        for event, elem in etree.iterparse(source, events=('end',), tag=PARSE_TAGS):
+            local = _local(elem)
+            yield local, legacy_party_row(elem) if local == "DistinctParty" else _other_row(local, elem)
+            _clear(elem)
+
+
+def fsm_rows(xml_path):
+    with open_xml_source(xml_path) as source:
+        party, in_primary, has_name, has_profile = None, False, False, False
+        for event, elem in etree.iterparse(source, events=("start", "end"), tag=FSM_TAGS):
+            local = _local(elem)
+            if event == "start":
+                if local == "DistinctParty":
+                    party = [elem.get("FixedRef"), "", ""]
+                    in_primary = has_name = has_profile = False
+                elif local == "Profile" and party is not None and not has_profile:
+                    party[2], has_profile = elem.get("PartySubTypeID"), True
+                elif local == "Identity":
+                    in_primary = elem.get("Primary") == "true"
+                continue
+            if local == "NamePartValue":
+                if in_primary and not has_name:
+                    party[1], has_name = elem.text, True
+            elif local == "Identity":
+                in_primary = False
+            elif local in ("DistinctParty", "ProfileRelationship", "SanctionsEntry"):
+                row = party if local == "DistinctParty" else _other_row(local, elem)
+                party = None
+                yield local, row
+                _clear(elem)
+
+
+def child_step_rows(xml_path):
+    with open_xml_source(xml_path) as source:
+        yield from extract_rows(etree.iterparse(source, events=("end",), tag=PARSE_TAGS))
+
+
+def _best(fn, repeat):
+    best, result = None, None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        result = fn()
+        elapsed = time.perf_counter() - t0
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark flatten_ofac party extraction")
+    parser.add_argument("xml", nargs="?", default=None, help=f"XML to parse (default: {XML_PATH})")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per variant; best time is reported")
+    parser.add_argument("--sample", type=int, default=5000,
+                        help="Parties kept in memory for the extraction-only measurement")
+    args = parser.parse_args()
+    xml_path = args.xml or find_xml_source(XML_PATH)
+
+    variants = (("legacy find()", legacy_rows), ("start/end FSM", fsm_rows),
+                ("child steps", child_step_rows))
+    print(f"Full streaming pass on {xml_path} (best of {args.repeat})")
+    results = {}
+    for name, fn in variants:
+        elapsed, rows = _best(lambda: list(fn(xml_path)), args.repeat)
+        results[name] = (elapsed, rows)
+        print(f"  {name:14s} {elapsed:8.3f}s  {len(rows) / elapsed:12,.0f} elements/s")
+
+    baseline_time, baseline_rows = results["legacy find()"]
+    for name, (elapsed, rows) in results.items():
+        if rows != baseline_rows:
+            print(f"[FAIL] {name}: rows differ from legacy find()")
+            sys.exit(1)
+
+    # Extraction alone: parse a sample of parties once, keep the trees.
+    sample = []
+    with open_xml_source(xml_path) as source:
+        for event, elem in etree.iterparse(source, events=('end',), tag="{*}DistinctParty"):
+            sample.append(elem)
+            if len(sample) >= args.sample:
+                break
+    print(f"\nExtraction only, {len(sample)} pre-parsed parties (best of {args.repeat})")
+    for name, fn in (("legacy find()", legacy_party_row), ("child steps", _party_row)):
+        elapsed, _ = _best(lambda: [fn(e) for e in sample], args.repeat)
+        print(f"  {name:14s} {elapsed / max(1, len(sample)) * 1e6:8.2f} us/party")
+
+    child_time = results["child steps"][0]
+    print(f"\n[PASS] {len(baseline_rows)} identical rows; "
+          f"full-pass speedup {baseline_time / child_time:.2f}x vs legacy find()")
+
+
+if __name__ == "__main__":
+    main()
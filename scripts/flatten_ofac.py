@@ -1,93 +1,600 @@
+import argparse
 import csv
+import hashlib
+import io
+import json
+import mmap
 import os
+import re
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack
+from pathlib import Path
 from lxml import etree
 
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import RunMetrics, find_xml_source, is_compressed_xml, open_xml_source
+
 # Constants
+# Plain path of the OFAC download; .gz/.xz/.zip archives next to it are also
+# accepted (see common.find_xml_source) and streamed without unpacking.
 XML_PATH = "data/SDN_ADVANCED.XML"
 PARTIES_CSV = "data/parties.csv"
 RELATIONSHIPS_CSV = "data/relationships.csv"
+SANCTIONS_ENTRIES_CSV = "data/sanctions_entries.csv"
+
+# Delta flattening: fingerprints of the last flatten of the canonical XML, and
+# the directory that receives {parties,relationships}_{added,changed,removed}.csv.
+# The delta files are a report for operators; no pipeline stage reads them
+# (load_data --incremental diffs against the database itself).
+FINGERPRINTS_PATH = "data/flatten_fingerprints.json"
+DELTA_DIR = "data/delta"
+
+# Optional columnar export (--columnar): one .npy file per column, for analysis
+# with np.load(..., mmap_mode="r"). load_data.py does not read it; it needs
+# per-row dicts, which the CSV reader yields just as fast.
+COLUMNAR_DIR = "data/columnar"
+COLUMNAR_VERSION = 1
+# Rows per slice when iterating columnar data, so a memory-mapped column is
+# never converted to Python objects all at once.
+COLUMNAR_BATCH = 65536
+
+# Sidecar index FixedRef -> (byte offset, length) of each DistinctParty in the
+# XML, so a single full party record can be parsed on demand (see read_party_element).
+PARTY_INDEX_CSV = "data/party_index.csv"
 
 # Namespaces
 NS = {"ns": "http://www.un.org/sanctions/1.0"}
 
-def get_text(element, xpath, namespaces=None):
-    res = element.xpath(xpath, namespaces=namespaces)
-    return res[0].text if res else ""
+# Top-level elements the flattener extracts. They live in separate sections of
+# the document (DistinctParties, ProfileRelationships, SanctionsEntries), so a
+# single iterparse filtered on all three tags sees each of them exactly once.
+PARSE_TAGS = ("{*}DistinctParty", "{*}ProfileRelationship", "{*}SanctionsEntry")
+# Party sub-elements read by _party_row() (see there for why child steps).
+PROFILE_TAG = "{*}Profile"
+IDENTITY_TAG = "{*}Identity"
+NAME_PART_TAG = "{*}NamePartValue"
+
+# Parallel mode (--workers N): byte patterns for the start of each top-level
+# element and the end of the section that holds it. Matched on the raw file, so
+# the document is only tokenised once, by the workers.
+_ELEMENT_START_RE = re.compile(rb"<(?:[\w.-]+:)?(DistinctParty|ProfileRelationship|SanctionsEntry)[\s/>]")
+_SECTION_END_RE = re.compile(rb"</(?:[\w.-]+:)?(DistinctParties|ProfileRelationships|SanctionsEntries)\s*>")
+_ROOT_START_RE = re.compile(rb"<(?![?!])([^\s/>]+)[^>]*>")
+_PARTY_START_RE = re.compile(rb"<(?:[\w.-]+:)?DistinctParty\b[^>]*?\bFixedRef=[\"']([^\"']*)[\"'][^>]*>")
+_PARTY_END_RE = re.compile(rb"</(?:[\w.-]+:)?DistinctParty\s*>")
+_SECTION_OF = {
+    b"DistinctParty": b"DistinctParties",
+    b"ProfileRelationship": b"ProfileRelationships",
+    b"SanctionsEntry": b"SanctionsEntries",
+}
+# Chunks per worker: enough to even out uneven element sizes across the pool.
+CHUNKS_PER_WORKER = 4
+
+def _party_row(elem):
+    """[FixedRef, primary name, PartySubTypeID] for one DistinctParty.
+
+    Walks schema-anchored child steps (DistinctParty > Profile > Identity)
+    instead of `.//` wildcard searches, so the large Feature subtrees beside
+    the identities are never visited. Only the matched Identity is descended
+    into, by a C-level iter(). Same result as the previous
+    find(".//{*}Identity[@Primary='true']//{*}NamePartValue") and
+    find(".//{*}Profile"): the first match in document order.
+    """
+    primary_name = ""
+    party_subtype_id = ""
+    profile = next(elem.iterchildren(PROFILE_TAG), None)
+    if profile is not None:
+        party_subtype_id = profile.get("PartySubTypeID")
+        for identity in profile.iterchildren(IDENTITY_TAG):
+            if identity.get("Primary") != "true":
+                continue
+            name_elem = next(identity.iter(NAME_PART_TAG), None)
+            if name_elem is not None:
+                primary_name = name_elem.text
+                break
+    return [elem.get("FixedRef"), primary_name, party_subtype_id]
+
+def _relationship_row(elem):
+    return [
+        elem.get("ID"),
+        elem.get("From-ProfileID"),
+        elem.get("To-ProfileID"),
+        elem.get("RelationTypeID"),
+    ]
+
+def _sanctions_entry_row(elem):
+    return [elem.get("ProfileID"), elem.get("ListID")]
+
+def _clear(elem):
+    elem.clear()
+    while elem.getprevious() is not None:
+        del elem.getparent()[0]
+
+# Local tag name -> row builder for the top-level elements in PARSE_TAGS.
+ROW_BUILDERS = {
+    "DistinctParty": _party_row,
+    "ProfileRelationship": _relationship_row,
+    "SanctionsEntry": _sanctions_entry_row,
+}
+
+def extract_rows(context):
+    """Yield (local tag, row) from an iterparse over PARSE_TAGS with end events.
+
+    Shared by the serial pass and the parallel workers. Each completed
+    top-level element is dispatched on its local name, then cleared.
+    """
+    local_names = {}    # namespaced tag -> local name
+    for event, elem in context:
+        tag = elem.tag
+        local = local_names.get(tag)
+        if local is None:
+            local = local_names[tag] = etree.QName(tag).localname
+        yield local, ROW_BUILDERS[local](elem)
+        # Clear element to save memory
+        _clear(elem)
+
+def _iter_rows_serial(xml_path):
+    """Yield (local tag, row) in document order from one streaming pass."""
+    with open_xml_source(xml_path) as source:
+        yield from extract_rows(etree.iterparse(source, events=("end",), tag=PARSE_TAGS))
+
+def scan_chunks(xml_path, workers):
+    """Split the top-level elements of xml_path into byte ranges for parallel parsing.
+
+    Returns (root_open, chunks): the document's root start tag (re-used so the
+    chunks resolve the same namespaces) and an offset-ordered list of
+    (start, end, tag) ranges, each holding whole elements of a single tag.
+    """
+    with open(xml_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        root_match = _ROOT_START_RE.search(mm)
+        if root_match is None:
+            raise ValueError(f"{xml_path}: no root element found")
+        root_open = root_match.group(0)
+        starts = [(m.start(), m.group(1)) for m in _ELEMENT_START_RE.finditer(mm)]
+        section_ends = {m.group(1): m.start() for m in _SECTION_END_RE.finditer(mm)}
+        size = len(mm)
+
+    target = max(1, size // max(1, workers * CHUNKS_PER_WORKER))
+    chunks = []
+    chunk_start = None
+    for i, (offset, tag) in enumerate(starts):
+        if chunk_start is None:
+            chunk_start = offset
+        nxt = starts[i + 1] if i + 1 < len(starts) else None
+        if nxt is None or nxt[1] != tag:
+            # Last element of its section: the chunk runs up to the section close.
+            chunks.append((chunk_start, section_ends.get(_SECTION_OF[tag], size), tag.decode()))
+            chunk_start = None
+        elif nxt[0] - chunk_start >= target:
+            chunks.append((chunk_start, nxt[0], tag.decode()))
+            chunk_start = None
+    return root_open, chunks
+
+def _parse_chunk(args):
+    """Process-pool worker: parse one byte range and return (tag, rows)."""
+    xml_path, root_open, start, end, tag = args
+    with open(xml_path, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    root_name = _ROOT_START_RE.match(root_open).group(1)
+    source = io.BytesIO(root_open + data + b"</" + root_name + b">")
+    context = etree.iterparse(source, events=("end",), tag=PARSE_TAGS)
+    return tag, [row for _, row in extract_rows(context)]
+
+def _iter_rows_parallel(xml_path, workers):
+    """Yield (local tag, row) in document order, parsing chunks across processes.
+
+    Executor.map returns results in submission order and chunks are submitted
+    in file order, so the merged stream is identical to _iter_rows_serial().
+    """
+    root_open, chunks = scan_chunks(xml_path, workers)
+    print(f"Parsing {len(chunks)} chunks with {workers} workers...")
+    tasks = [(xml_path, root_open, start, end, tag) for start, end, tag in chunks]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for tag, rows in pool.map(_parse_chunk, tasks):
+            for row in rows:
+                yield tag, row
+
+def iter_xml_rows(xml_path=None, workers=1):
+    """Yield (local tag, row) for every DistinctParty, ProfileRelationship and
+    SanctionsEntry in document order, serially or across `workers` processes.
+
+    Rows are the same lists that the flattener writes to the CSVs. Compressed
+    input is always parsed serially (the chunk scan needs byte offsets).
+    """
+    xml_path = xml_path or find_xml_source(XML_PATH)
+    if workers > 1 and not is_compressed_xml(xml_path):
+        return _iter_rows_parallel(xml_path, workers)
+    return _iter_rows_serial(xml_path)
+
+def write_party_index(xml_path=XML_PATH, index_path=PARTY_INDEX_CSV):
+    """Write FixedRef -> (offset, length) of every DistinctParty element in xml_path."""
+    count = 0
+    with open(xml_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm, \
+         open(index_path, 'w', newline='', encoding='utf-8') as out:
+        writer = csv.writer(out)
+        writer.writerow(["party_id", "offset", "length"])
+        for m in _PARTY_START_RE.finditer(mm):
+            end = _PARTY_END_RE.search(mm, m.end())
+            if end is None:
+                break
+            writer.writerow([m.group(1).decode("utf-8"), m.start(), end.end() - m.start()])
+            count += 1
+    print(f"Party index written to {index_path} ({count} parties)")
+
+def load_party_index(index_path=PARTY_INDEX_CSV):
+    """Return {party_id: (offset, length)} from a write_party_index() file."""
+    with open(index_path, 'r', encoding='utf-8') as f:
+        return {row["party_id"]: (int(row["offset"]), int(row["length"]))
+                for row in csv.DictReader(f)}
+
+def read_party_element(party_id, index=None, xml_path=XML_PATH):
+    """Parse the full DistinctParty element for one FixedRef without reading the whole XML.
+
+    `index` is a load_party_index() dict; pass it in when looking up many
+    parties. Returns None for unknown IDs. Raises ValueError when the index no
+    longer matches the XML (re-run flatten_ofac.py).
+    """
+    if index is None:
+        index = load_party_index()
+    loc = index.get(str(party_id))
+    if loc is None:
+        return None
+    offset, length = loc
+    with open(xml_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        root_match = _ROOT_START_RE.search(mm)
+        root_open, root_name = root_match.group(0, 1) if root_match else (None, None)
+        data = mm[offset:offset + length]
+    m = _PARTY_START_RE.match(data)
+    if root_open is None or m is None or m.group(1).decode("utf-8") != str(party_id):
+        raise ValueError(f"{PARTY_INDEX_CSV} is stale for {xml_path}; re-run flatten_ofac.py")
+    # Wrap in the document's root start tag so namespace prefixes resolve.
+    root = etree.fromstring(root_open + data + b"</" + root_name + b">")
+    return root[0]
+
+def party_details(elem):
+    """Summarise a DistinctParty element: aliases and features.
+
+    Identity documents and addresses live in the XML's IDRegDocuments and
+    Locations sections, referenced by the IDs reported here.
+    """
+    profile = elem.find("{*}Profile")
+    aliases = []
+    for identity in elem.iterfind(".//{*}Identity"):
+        for alias in identity.iterfind("{*}Alias"):
+            for name in alias.iterfind("{*}DocumentedName"):
+                aliases.append({
+                    "name": " ".join(v.text or "" for v in name.iterfind(".//{*}NamePartValue")),
+                    "primary": alias.get("Primary") == "true",
+                    "aliasTypeId": alias.get("AliasTypeID"),
+                    "identityId": identity.get("ID"),
+                })
+    features = []
+    for feature in elem.iterfind(".//{*}Feature"):
+        for version in feature.iterfind("{*}FeatureVersion"):
+            features.append({
+                "featureTypeId": feature.get("FeatureTypeID"),
+                "details": [d.text for d in version.iterfind("{*}VersionDetail") if d.text],
+                "locationIds": [loc.get("LocationID") for loc in version.iterfind("{*}VersionLocation")],
+            })
+    return {
+        "party_id": elem.get("FixedRef"),
+        "party_type": profile.get("PartySubTypeID") if profile is not None else "",
+        "aliases": aliases,
+        "features": features,
+    }
+
+def _fingerprint(row):
+    """Short content hash of a flattened row (8-byte blake2b, hex)."""
+    data = "\x1f".join(v or "" for v in row).encode("utf-8")
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+def load_fingerprints(path=FINGERPRINTS_PATH):
+    """Return the previous run's {"parties": {...}, "relationships": {...}} or None."""
+    if not os.path.exists(path):
+        return None
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def save_fingerprints(fingerprints, path=FINGERPRINTS_PATH):
+    # Write-then-rename so an interrupted run never leaves a truncated store
+    # (which would turn the next refresh into a spurious full "added" delta).
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(fingerprints, f, separators=(",", ":"), sort_keys=True)
+    os.replace(tmp_path, path)
+
+def _open_delta_writers(stack, kind, header):
+    """Open added/changed/removed CSV writers for one row kind under DELTA_DIR."""
+    writers = {}
+    for change in ("added", "changed", "removed"):
+        f = stack.enter_context(open(os.path.join(DELTA_DIR, f"{kind}_{change}.csv"),
+                                     'w', newline='', encoding='utf-8'))
+        writers[change] = csv.writer(f)
+        # Removed rows only exist in the previous snapshot, so only their key is known.
+        writers[change].writerow(header[:1] if change == "removed" else header)
+    return writers
+
+def _require_numpy():
+    try:
+        import numpy as np
+    except ImportError as e:
+        print("ERROR: numpy is required for columnar output.")
+        print("\nFix: pip install numpy")
+        raise SystemExit(1) from e
+    return np
+
+def _dictionary_encode(values):
+    """Return (int32 codes, distinct values in first-seen order)."""
+    index = {}
+    codes = [index.setdefault(v, len(index)) for v in values]
+    return codes, list(index)
+
+def write_columnar(party_rows, rel_rows, out_dir=COLUMNAR_DIR):
+    """Write flattened rows as memory-mappable NumPy columns.
+
+    Layout of out_dir:
+      meta.json                    format version, row counts, code dictionaries
+                                   and the dtype of each code column
+      party_id.npy                 fixed-width unicode IDs
+      party_type.npy               codes into meta["party_types"]
+      party_name.npy               int32 codes into the name dictionary
+      names_data.npy / names_offsets.npy
+                                   UTF-8 bytes of each distinct name and their
+                                   start offsets (len = n_names + 1)
+      rel_id.npy, rel_from.npy, rel_to.npy
+                                   fixed-width unicode IDs
+      rel_type.npy                 codes into meta["rel_types"]
+    """
+    np = _require_numpy()
+    os.makedirs(out_dir, exist_ok=True)
+    meta_path = os.path.join(out_dir, "meta.json")
+    if os.path.exists(meta_path):
+        os.remove(meta_path)
+
+    party_type_codes, party_types = _dictionary_encode(r[2] or "" for r in party_rows)
+    name_codes, names = _dictionary_encode(r[1] or "" for r in party_rows)
+    rel_type_codes, rel_types = _dictionary_encode(r[3] or "" for r in rel_rows)
+
+    encoded = [n.encode("utf-8") for n in names]
+    offsets = np.zeros(len(encoded) + 1, dtype=np.int64)
+    np.cumsum([len(b) for b in encoded], out=offsets[1:])
+
+    def code_dtype(dictionary):
+        # Smallest unsigned type that holds every code, so a long type
+        # dictionary widens the column instead of wrapping or overflowing.
+        return np.min_scalar_type(max(len(dictionary) - 1, 0))
+
+    code_dtypes = {"party_type": code_dtype(party_types), "rel_type": code_dtype(rel_types)}
+
+    def ids(rows, i):
+        # Explicit dtype keeps empty inputs loadable as strings, not float64.
+        width = max((len(r[i] or "") for r in rows), default=1) or 1
+        return np.array([r[i] or "" for r in rows], dtype=f"<U{width}")
+
+    columns = {
+        "party_id": ids(party_rows, 0),
+        "party_type": np.array(party_type_codes, dtype=code_dtypes["party_type"]),
+        "party_name": np.array(name_codes, dtype=np.int32),
+        "names_data": np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        "names_offsets": offsets,
+        "rel_id": ids(rel_rows, 0),
+        "rel_from": ids(rel_rows, 1),
+        "rel_to": ids(rel_rows, 2),
+        "rel_type": np.array(rel_type_codes, dtype=code_dtypes["rel_type"]),
+    }
+    for name, arr in columns.items():
+        np.save(os.path.join(out_dir, f"{name}.npy"), arr)
+
+    # meta.json last: readers treat its presence as "the column set is complete".
+    meta = {
+        "version": COLUMNAR_VERSION,
+        "parties": len(party_rows),
+        "relationships": len(rel_rows),
+        "party_types": party_types,
+        "rel_types": rel_types,
+        "code_dtypes": {name: dt.str for name, dt in code_dtypes.items()},
+    }
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump(meta, f, indent=2)
+    print(f"Columnar output written to {out_dir}/ "
+          f"({len(party_rows)} parties, {len(names)} distinct names, {len(rel_rows)} relationships)")
+
+def load_columnar(path=COLUMNAR_DIR, mmap=True):
+    """Load a write_columnar() directory as {column name: ndarray} plus "meta".
+
+    With mmap=True the arrays are memory-mapped read-only, so opening the full
+    list costs almost nothing until columns are actually touched.
+    """
+    np = _require_numpy()
+    with open(os.path.join(path, "meta.json"), 'r', encoding='utf-8') as f:
+        meta = json.load(f)
+    if meta.get("version") != COLUMNAR_VERSION:
+        raise ValueError(f"{path}: unsupported columnar version {meta.get('version')!r}")
+    cols = {"meta": meta}
+    for name in ("party_id", "party_type", "party_name", "names_data", "names_offsets",
+                 "rel_id", "rel_from", "rel_to", "rel_type"):
+        cols[name] = np.load(os.path.join(path, f"{name}.npy"), mmap_mode="r" if mmap else None)
+    # Exports written before code_dtypes was recorded used int8 codes.
+    for name, dtype in meta.get("code_dtypes", {"party_type": "|i1", "rel_type": "|i1"}).items():
+        if cols[name].dtype != np.dtype(dtype):
+            raise ValueError(f"{path}: {name}.npy is {cols[name].dtype}, meta.json says {dtype}")
+    return cols
+
+def decode_names(cols):
+    """Materialise the name dictionary of a load_columnar() result as a list of str."""
+    data = cols["names_data"].tobytes()
+    offsets = cols["names_offsets"].tolist()
+    return [data[a:b].decode("utf-8") for a, b in zip(offsets, offsets[1:])]
+
+def _column_slices(*columns, batch=COLUMNAR_BATCH):
+    """Yield batches of aligned rows, converting `batch` rows of each column at a time."""
+    n = len(columns[0]) if columns else 0
+    for start in range(0, n, batch):
+        yield zip(*(col[start:start + batch].tolist() for col in columns))
+
+def iter_columnar_parties(cols):
+    """Yield (party_id, primary_name, party_type) rows from columnar data."""
+    names = decode_names(cols)
+    party_types = cols["meta"]["party_types"]
+    for rows in _column_slices(cols["party_id"], cols["party_name"], cols["party_type"]):
+        for pid, name_code, type_code in rows:
+            yield pid, names[name_code], party_types[type_code]
+
+def iter_columnar_relationships(cols):
+    """Yield (rel_id, from_party, to_party, rel_type) rows from columnar data."""
+    rel_types = cols["meta"]["rel_types"]
+    for rows in _column_slices(cols["rel_id"], cols["rel_from"], cols["rel_to"], cols["rel_type"]):
+        for rel_id, from_p, to_p, type_code in rows:
+            yield rel_id, from_p, to_p, rel_types[type_code]
+
+def flatten_xml(columnar=False, workers=1, xml_path=None):
+    canonical = find_xml_source(XML_PATH)
+    xml_path = xml_path or canonical
+    print(f"Starting to parse {xml_path}...")
 
-def flatten_xml():
-    print(f"Starting to parse {XML_PATH}...")
-    
     # Check if files exist
-    if not os.path.exists(XML_PATH):
-        print(f"Error: {XML_PATH} not found.")
+    if not os.path.exists(xml_path):
+        print(f"Error: {xml_path} not found.")
         return
 
+    # Only the canonical input advances the fingerprint store. Flattening an
+    # archived or ad-hoc file (--xml) still diffs against it, but must not make
+    # the next refresh of the real list report a delta against that file.
+    update_fingerprints = os.path.exists(canonical) and os.path.samefile(xml_path, canonical)
+
+    # Byte-offset features need a seekable, uncompressed file.
+    compressed = is_compressed_xml(xml_path)
+    if compressed and workers > 1:
+        print(f"{xml_path} is compressed — parsing serially (--workers needs a plain XML file).")
+        workers = 1
+
+    if columnar:
+        _require_numpy()  # fail before the parse, not after it
+
+    metrics = RunMetrics("flatten_ofac", xml=xml_path, workers=workers, columnar=columnar)
+
+    previous = load_fingerprints()
+    current = {"parties": {}, "relationships": {}}
+    # Row buffers for the columnar writer (fixed-width columns need the max width).
+    column_rows = {"parties": [], "relationships": []}
+    party_header = ["party_id", "primary_name", "party_type"]
+    rel_header = ["rel_id", "from_party", "to_party", "rel_type"]
+
     # Open CSV files
-    with open(PARTIES_CSV, 'w', newline='', encoding='utf-8') as p_file, \
-         open(RELATIONSHIPS_CSV, 'w', newline='', encoding='utf-8') as r_file:
-        
+    with ExitStack() as stack:
+        p_file, r_file, s_file = (
+            stack.enter_context(open(path, 'w', newline='', encoding='utf-8'))
+            for path in (PARTIES_CSV, RELATIONSHIPS_CSV, SANCTIONS_ENTRIES_CSV)
+        )
+
         party_writer = csv.writer(p_file)
         rel_writer = csv.writer(r_file)
-        
+        entry_writer = csv.writer(s_file)
+
         # Headers
-        party_writer.writerow(["party_id", "primary_name", "party_type"])
-        rel_writer.writerow(["rel_id", "from_party", "to_party", "rel_type"])
-        
-        # Iterative parsing for memory efficiency
-        context = etree.iterparse(XML_PATH, events=('end',), tag='{*}DistinctParty')
-        
-        count = 0
-        for event, elem in context:
-            party_id = elem.get("FixedRef")
-            
-            # Primary Name
-            primary_name = ""
-            name_elem = elem.find(".//{*}Identity[@Primary='true']//{*}NamePartValue")
-            if name_elem is not None:
-                primary_name = name_elem.text
+        party_writer.writerow(party_header)
+        rel_writer.writerow(rel_header)
+        entry_writer.writerow(["profile_id", "list_id"])
 
-            # Type and SubType
-            sub_type_elem = elem.find(".//{*}Profile")
-            if sub_type_elem is not None:
-                party_subtype_id = sub_type_elem.get("PartySubTypeID")
-                party_writer.writerow([party_id, primary_name, party_subtype_id])
-            else:
-                party_writer.writerow([party_id, primary_name, ""])
-            
-            count += 1
-            if count % 1000 == 0:
-                print(f"Processed {count} parties...")
-            
-            # Clear element to save memory
-            elem.clear()
-            while elem.getprevious() is not None:
-                del elem.getparent()[0]
-        
-        print(f"Total parties processed: {count}")
-        
-        # Relationships are usually in a separate section in this XML schema
-        # Let's reset the context for ProfileRelationships
-        del context
-        context = etree.iterparse(XML_PATH, events=('end',), tag='{*}ProfileRelationship')
-        
-        rel_count = 0
-        for event, elem in context:
-            rel_id = elem.get("ID")
-            from_p = elem.get("From-ProfileID")
-            to_p = elem.get("To-ProfileID")
-            rel_type = elem.get("RelationTypeID")
-            
-            rel_writer.writerow([rel_id, from_p, to_p, rel_type])
-            
-            rel_count += 1
-            if rel_count % 1000 == 0:
-                print(f"Processed {rel_count} relationships...")
-                
-            elem.clear()
-            while elem.getprevious() is not None:
-                del elem.getparent()[0]
-                
-        print(f"Total relationships processed: {rel_count}")
+        # Delta files are only meaningful against a previous snapshot; on the
+        # first run everything would be "added", which is just the full CSV.
+        delta_writers = {}
+        if previous is not None:
+            os.makedirs(DELTA_DIR, exist_ok=True)
+            delta_writers = {
+                "parties": _open_delta_writers(stack, "parties", party_header),
+                "relationships": _open_delta_writers(stack, "relationships", rel_header),
+            }
+
+        # Dispatch table: local tag name -> (writer, progress label, fingerprint kind or None)
+        handlers = {
+            "DistinctParty": (party_writer, "parties", "parties"),
+            "ProfileRelationship": (rel_writer, "relationships", "relationships"),
+            "SanctionsEntry": (entry_writer, "sanctions entries", None),
+        }
+        counts = {label: 0 for _, label, _ in handlers.values()}
+        delta_counts = {(kind, change): 0
+                        for kind in current for change in ("added", "changed", "removed")}
+
+        # Single streaming pass over the document for memory efficiency, or
+        # chunked across a process pool; both yield rows in document order.
+        with metrics.stage("parse"):
+            for tag, row in iter_xml_rows(xml_path, workers):
+                writer, label, kind = handlers[tag]
+                writer.writerow(row)
+
+                if kind is not None:
+                    if columnar:
+                        column_rows[kind].append(row)
+                    fp = _fingerprint(row)
+                    current[kind][row[0]] = fp
+                    if previous is not None:
+                        old_fp = previous.get(kind, {}).get(row[0])
+                        change = "added" if old_fp is None else ("changed" if old_fp != fp else None)
+                        if change:
+                            delta_writers[kind][change].writerow(row)
+                            delta_counts[(kind, change)] += 1
+
+                counts[label] = metrics.count(label)
+                if counts[label] % 1000 == 0:
+                    print(f"Processed {counts[label]} {label}... ({metrics.rate(label):,.0f}/s)")
+
+        for label, count in counts.items():
+            print(f"Total {label} processed: {count}")
+
+        if previous is not None:
+            with metrics.stage("delta"):
+                for kind, fps in current.items():
+                    for key in sorted(set(previous.get(kind, {})) - set(fps)):
+                        delta_writers[kind]["removed"].writerow([key])
+                        delta_counts[(kind, "removed")] += 1
+            print(f"Delta vs previous snapshot written to {DELTA_DIR}/:")
+            for kind in current:
+                print(f"  {kind}: " + ", ".join(
+                    f"{delta_counts[(kind, change)]} {change}"
+                    for change in ("added", "changed", "removed")))
+        else:
+            print(f"No previous fingerprints at {FINGERPRINTS_PATH} — full flatten only.")
+
+    if update_fingerprints:
+        with metrics.stage("fingerprints"):
+            save_fingerprints(current)
+        print(f"Fingerprints saved to {FINGERPRINTS_PATH}")
+    else:
+        print(f"{xml_path} is not {canonical}; {FINGERPRINTS_PATH} left unchanged.")
+
+    if compressed:
+        print(f"Skipping {PARTY_INDEX_CSV}: byte offsets need the uncompressed XML.")
+    else:
+        with metrics.stage("party_index"):
+            write_party_index(xml_path)
+
+    if columnar:
+        with metrics.stage("columnar"):
+            write_columnar(column_rows["parties"], column_rows["relationships"])
+
+    metrics.write()
 
 if __name__ == "__main__":
-    flatten_xml()
+    parser = argparse.ArgumentParser(description="Flatten OFAC SDN_ADVANCED.XML to CSV")
+    parser.add_argument(
+        "--columnar",
+        action="store_true",
+        help=f"Also write memory-mappable NumPy columns to {COLUMNAR_DIR}/ (requires numpy)",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Parse the XML in byte-range chunks across N processes (default: 1, serial). "
+             "Output is identical to serial mode.",
+    )
+    parser.add_argument(
+        "--xml",
+        default=None,
+        help=f"OFAC XML to flatten: plain, .gz, .xz or .zip (default: {XML_PATH} or a compressed copy)",
+    )
+    args = parser.parse_args()
+    flatten_xml(columnar=args.columnar, workers=max(1, args.workers), xml_path=args.xml)
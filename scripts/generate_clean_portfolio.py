@@ -6,7 +6,8 @@ risk heatmap shows risk as the *exception* rather than the rule. Without this,
 the loaded data is essentially the entire OFAC SDN list, so ~99.9% of nodes are
 sanctioned (high risk) and the heatmap is uniformly red.
 
-What it creates (all idempotent — CLEAN-* docs/edges are wiped and rebuilt):
+What it creates (all idempotent — CLEAN-* docs/edges are wiped and rebuilt
+inside one stream transaction, so readers never see a half-deleted portfolio):
   - Clean Organizations and Persons (dataSource="CleanPortfolio", riskScore=0)
   - A believable internal network among them (ownership trees, leadership, family)
     that carries NO risk (everyone stays green)
@@ -30,7 +31,9 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bulk_loader import stream_transaction
 from common import apply_config_to_env, get_arango_config, load_dotenv, sanitize_url
+from degree_counters import DEGREE_FIELD, DEGREE_TOTAL_FIELD, refresh_degrees
 
 from arango import ArangoClient
 
@@ -38,6 +41,26 @@ SEED = 20260528
 NUM_ORGS = 120
 NUM_PERSONS = 180
 CLEAN_SOURCE = "CleanPortfolio"
+# Everything the rebuild removes or writes; declared up front for the transaction.
+PORTFOLIO_COLLECTIONS = ["Person", "Organization", "owned_by", "leader_of", "family_member_of"]
+
+# provision_indexes.py EXPLAINs these to check they use the ri_* indexes.
+WIPE_QUERY = """FOR d IN @@col FILTER d.dataSource == @s REMOVE d IN @@col
+    RETURN [OLD._from, OLD._to]"""
+# `d.riskScore >= 0.9` (not `(d.riskScore || 0)`) so the ri_riskScore index
+# applies; a missing score sorts below 0.9 either way. The degree counts
+# owned_by, leader_of and family_member_of only: `operates` links are left out.
+ANCHOR_QUERY = f"""FOR d IN @@col
+    FILTER d.riskScore >= 0.9 AND d.dataSource != @s
+    LET operates = d.{DEGREE_FIELD}.operates
+    LET deg = d.{DEGREE_TOTAL_FIELD} - (operates.out || 0) - (operates.in || 0)
+    SORT deg ASC, RAND()
+    LIMIT @n RETURN d._id"""
+# Anchor candidates whose counters were never written (databases loaded
+# before degree_counters.py, or whose load_data run was skipped as current).
+UNCOUNTED_ANCHORS_QUERY = f"""FOR d IN @@col
+    FILTER d.riskScore >= 0.9 AND d.dataSource != @s AND d.{DEGREE_TOTAL_FIELD} == null
+    RETURN d._id"""
 
 ORG_ADJ = ["Atlantic", "Summit", "Pioneer", "Cascade", "Meridian", "Granite", "Harbor",
            "Cedar", "Vanguard", "Northwind", "Brightwater", "Ironwood", "Silverline",
@@ -66,18 +89,27 @@ def main():
 
     client = ArangoClient(hosts=cfg.url)
     db = client.db(cfg.database, username=cfg.username, password=cfg.password)
-    rng = random.Random(SEED)
+    collections = [c for c in PORTFOLIO_COLLECTIONS if db.has_collection(c)]
+    with stream_transaction(db, write=collections) as txn:
+        rebuild_portfolio(txn, random.Random(SEED))
+    print("Committed the rebuilt portfolio.")
 
+    print("\nDone. Now run: python scripts/calculate_inferred_risk.py")
+
+
+def rebuild_portfolio(db, rng):
+    """Wipe and regenerate the portfolio through `db` (a stream transaction in main())."""
     # ------------------------------------------------------------------
     # 0. Wipe any previous clean-portfolio docs/edges (idempotent rebuild)
     # ------------------------------------------------------------------
     print("Removing any existing CleanPortfolio docs/edges...")
-    for coll in ["Person", "Organization", "owned_by", "leader_of", "family_member_of"]:
+    detached = set()  # real vertices that lose a clean edge
+    for coll in PORTFOLIO_COLLECTIONS:
         if db.has_collection(coll):
-            db.aql.execute(
-                f"FOR d IN {coll} FILTER d.dataSource == @s REMOVE d IN {coll}",
-                bind_vars={"s": CLEAN_SOURCE},
-            )
+            detached.update(v for pair in db.aql.execute(
+                WIPE_QUERY, bind_vars={"@col": coll, "s": CLEAN_SOURCE},
+            ) for v in pair if v)
+    refresh_degrees(db, detached)
 
     # ------------------------------------------------------------------
     # 1. Find real sanctioned anchors (high direct risk) to attach exposure to
@@ -86,19 +118,17 @@ def main():
         # Prefer LOW-degree sanctioned entities (few/no subsidiaries or other
         # links). A high-degree anchor like a big sanctioned conglomerate would
         # drag its whole red subsidiary network onto the canvas when expanded,
-        # flooding the otherwise-green portfolio view.
+        # flooding the otherwise-green portfolio view. Degree is the counter
+        # load_data maintains (degree_counters.py), not a recount; candidates
+        # without one are counted first, since a null degree would sort first.
+        uncounted = list(db.aql.execute(
+            UNCOUNTED_ANCHORS_QUERY, bind_vars={"@col": coll, "s": CLEAN_SOURCE},
+        ))
+        if uncounted:
+            print(f"  Counting degrees of {len(uncounted)} {coll} anchor candidates...")
+            refresh_degrees(db, uncounted)
         return list(db.aql.execute(
-            f"""FOR d IN {coll}
-                FILTER (d.riskScore || 0) >= 0.9 AND d.dataSource != @s
-                LET deg = LENGTH(FOR e IN owned_by
-                                 FILTER e._to == d._id OR e._from == d._id RETURN 1)
-                        + LENGTH(FOR e IN leader_of
-                                 FILTER e._to == d._id OR e._from == d._id RETURN 1)
-                        + LENGTH(FOR e IN family_member_of
-                                 FILTER e._to == d._id OR e._from == d._id RETURN 1)
-                SORT deg ASC, RAND()
-                LIMIT @n RETURN d._id""",
-            bind_vars={"s": CLEAN_SOURCE, "n": n},
+            ANCHOR_QUERY, bind_vars={"@col": coll, "s": CLEAN_SOURCE, "n": n},
         ))
 
     org_anchors = anchors("Organization", 4)
@@ -140,8 +170,8 @@ def main():
                         "dataSource": CLEAN_SOURCE, "scenario": "portfolio", "riskScore": 0,
                         "inferredRisk": 0})
 
-    db.collection("Organization").import_bulk(orgs, overwrite=False, on_duplicate="replace")
-    db.collection("Person").import_bulk(persons, overwrite=False, on_duplicate="replace")
+    db.collection("Organization").insert_many(orgs, overwrite_mode="replace")
+    db.collection("Person").insert_many(persons, overwrite_mode="replace")
     print(f"Inserted {len(orgs)} clean Organizations, {len(persons)} clean Persons")
 
     org_ids = [f"Organization/{o['_key']}" for o in orgs]
@@ -223,13 +253,13 @@ def main():
         family.append({"_key": ek(), "_from": per_ids[1], "_to": per_ids[0],
                        "label": "family_member_of", "dataSource": CLEAN_SOURCE}); exposures += 1
 
-    db.collection("owned_by").import_bulk(owned, overwrite=False, on_duplicate="replace")
-    db.collection("leader_of").import_bulk(leads, overwrite=False, on_duplicate="replace")
-    db.collection("family_member_of").import_bulk(family, overwrite=False, on_duplicate="replace")
+    db.collection("owned_by").insert_many(owned, overwrite_mode="replace")
+    db.collection("leader_of").insert_many(leads, overwrite_mode="replace")
+    db.collection("family_member_of").insert_many(family, overwrite_mode="replace")
     print(f"Inserted {len(owned)} owned_by, {len(leads)} leader_of, {len(family)} family edges "
           f"({exposures} of them are sanctioned-exposure links)")
 
-    print("\nDone. Now run: python scripts/calculate_inferred_risk.py")
+    refresh_degrees(db, {v for e in owned + leads + family for v in (e["_from"], e["_to"])})
 
 
 if __name__ == "__main__":
@@ -0,0 +1,316 @@
+"""
+generate_sdn_graph.py
+
+Seeded, streaming generator of synthetic SDN-shaped graphs for load and
+performance testing at production scale (10k to 10M parties), without the
+real OFAC download.
+
+Writes the same three files flatten_ofac.py produces, with the same headers:
+parties.csv, relationships.csv and sanctions_entries.csv. Everything
+downstream (load_data.py, calculate_direct_risk.py, ...) consumes them
+unchanged. The graph is built from motifs seen in the SDN list:
+
+  - ownership trees with power-law sizes and preferential attachment inside
+    each tree, many of them hung under a few sanctioned supernode
+    conglomerates (Zipf-weighted, so the top hub owns thousands)
+  - officers (leader_of) on a share of the companies
+  - vessel and aircraft fleets operated by companies (power-law fleet sizes)
+  - family cliques whose members lead recently created companies
+  - short ownership cycles (A owned_by B owned_by C owned_by A)
+  - cross-ownership between trees, plus a share of unmapped relation types
+    and isolated parties, as in the real list
+  - a few transliteration variants of recent names (entity-resolution bait)
+
+Each motif takes a fresh contiguous range of party IDs and only links to
+those, to a bounded window of recent companies, or to the fixed set of
+supernodes. Rows go to disk as they are generated, so memory stays flat at
+any scale. The same --seed and --parties always produce identical files.
+
+Run:
+    python scripts/generate_sdn_graph.py --parties 1M                 # -> data/generated/
+    python scripts/generate_sdn_graph.py --parties 50k --seed 7 --out-dir data   # replace the flattened CSVs
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import os
+import random
+import sys
+from collections import deque
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import RunMetrics
+
+DEFAULT_OUT_DIR = "data/generated"
+DEFAULT_SEED = 20261017
+
+# flatten_ofac.py party_type / rel_type / list_id codes
+PERSON, ORGANIZATION, VESSEL, AIRCRAFT = "4", "3", "1", "2"
+OWNED_BY, FAMILY_MEMBER_OF, LEADER_OF, OPERATES = "15003", "15004", "91725", "92019"
+# Relation types load_data.EDGE_MAP does not map; the loader skips them, as
+# it skips most OFAC relation types.
+UNMAPPED_REL_TYPES = ("1555", "15002")
+LIST_IDS = ("1550", "91512", "91507", "91243")
+LIST_WEIGHTS = (0.80, 0.12, 0.06, 0.02)
+
+# Motif mix (relative weights per draw)
+MOTIF_WEIGHTS = {
+    "isolated_person": 0.30,
+    "ownership_tree": 0.40,
+    "family_clique": 0.15,
+    "ownership_cycle": 0.03,
+    "isolated_craft": 0.12,
+}
+# Probability that a party of a motif is itself on a sanctions list
+SANCTIONED = {"hub": 1.0, "root": 0.5, "subsidiary": 0.15, "person": 0.4, "craft": 0.35}
+TREE_ALPHA = 1.4          # Pareto shape of ownership-tree sizes (lower = heavier tail)
+FLEET_ALPHA = 1.8
+MAX_TREE = 5000
+MAX_FLEET = 200
+HUB_SHARE = 0.35          # share of tree roots owned by a supernode
+PARTIES_PER_HUB = 25000   # one supernode per this many parties (at least 3)
+RECENT_WINDOW = 4096      # recent companies available for cross-links
+VARIANT_RATE = 0.02       # persons named as a transliteration of a recent name
+
+FIRST = ["Mohammed", "Ali", "Hassan", "Hussein", "Ahmad", "Omar", "Yusuf", "Ibrahim",
+         "Sergei", "Dmitri", "Alexei", "Viktor", "Igor", "Oleg", "Nikolai", "Yuri",
+         "Kim", "Ri", "Pak", "Choe", "Carlos", "Jorge", "Luis", "Miguel", "Rafael",
+         "Fatima", "Aisha", "Maryam", "Elena", "Olga", "Natalia", "Sofia", "Ana"]
+LAST = ["Al-Hashimi", "Rahimi", "Karimi", "Nasser", "Haddad", "Khalil", "Mansour",
+        "Ivanov", "Petrov", "Sokolov", "Volkov", "Morozov", "Orlov", "Kuznetsov",
+        "Song", "Jong", "Chol", "Medina", "Herrera", "Castillo", "Vargas", "Rojas",
+        "Suleiman", "Abbasi", "Tehrani", "Shirazi", "Zadeh", "Baghdadi", "Qasim"]
+# Spelling variants seen across transliterations; applied token-wise.
+VARIANTS = {"Mohammed": "Muhammad", "Ahmad": "Ahmed", "Yusuf": "Yousef", "Hussein": "Husayn",
+            "Omar": "Umar", "Sergei": "Sergey", "Dmitri": "Dmitriy", "Alexei": "Aleksey",
+            "Yuri": "Yury", "Aisha": "Aysha", "Maryam": "Mariam", "Al-Hashimi": "Al Hashemi",
+            "Ivanov": "Ivanoff", "Tehrani": "Tehrany", "Qasim": "Kassem", "Choe": "Choi"}
+ORG_WORDS = ["Petro", "Gulf", "Caspian", "Eastern", "Pars", "Volga", "Andes", "Baltic",
+             "Crescent", "Golden", "Silk", "Northern", "Delta", "Atlas", "Orient", "Falcon"]
+ORG_TRADES = ["Trading", "Shipping", "Holding", "Petrochemical", "Investment", "Logistics",
+              "Engineering", "Exchange", "Energy", "Marine", "Industrial", "Commercial"]
+ORG_SUFFIXES = ["LLC", "FZE", "Ltd", "JSC", "Co.", "S.A.", "Group", "Company", "PJSC"]
+VESSEL_WORDS = ["OCEAN", "STAR", "PEARL", "HORIZON", "NEPTUNE", "SEA", "GLORY", "SPIRIT",
+                "PACIFIC", "FORTUNE", "DIAMOND", "ATLANTIC", "LADY", "GRACE", "VICTORY"]
+TAIL_PREFIXES = ["EP", "YK", "UP", "RA", "YI", "P"]
+
+
+def parse_count(text: str) -> int:
+    """'50000', '50k', '2.5M' -> int."""
+    text = text.strip().lower().replace("_", "")
+    scale = {"k": 1_000, "m": 1_000_000}.get(text[-1:], 1)
+    return int(float(text[:-1] if scale > 1 else text) * scale)
+
+
+class _Writer:
+    """CSV sinks plus the party-ID budget; motifs allocate through party()."""
+
+    def __init__(self, stack: ExitStack, out_dir: str, parties: int, rng: random.Random,
+                 metrics: RunMetrics) -> None:
+        os.makedirs(out_dir, exist_ok=True)
+
+        def sink(name, header):
+            f = stack.enter_context(open(os.path.join(out_dir, name), "w", newline="", encoding="utf-8"))
+            writer = csv.writer(f)
+            writer.writerow(header)
+            return writer
+
+        self._parties = sink("parties.csv", ["party_id", "primary_name", "party_type"])
+        self._rels = sink("relationships.csv", ["rel_id", "from_party", "to_party", "rel_type"])
+        self._entries = sink("sanctions_entries.csv", ["profile_id", "list_id"])
+        self.rng = rng
+        self.metrics = metrics
+        self.limit = parties
+        self.next_party = 1
+        self.next_rel = 1
+        self.entries = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.next_party + 1
+
+    def party(self, party_type: str, name: str, sanctioned: float) -> Optional[str]:
+        """Write one party and return its ID, or None once the budget is spent."""
+        if self.next_party > self.limit:
+            return None
+        pid = str(self.next_party)
+        self.next_party += 1
+        self._parties.writerow((pid, name, party_type))
+        if self.rng.random() < sanctioned:
+            self._entries.writerow((pid, self.rng.choices(LIST_IDS, LIST_WEIGHTS)[0]))
+            self.entries += 1
+        n = self.metrics.count("parties")
+        if n % 100000 == 0:
+            print(f"  Generated {n} parties... ({self.metrics.rate('parties'):,.0f}/s)")
+        return pid
+
+    def rel(self, from_party: str, to_party: str, rel_type: str) -> None:
+        self._rels.writerow((str(self.next_rel), from_party, to_party, rel_type))
+        self.next_rel += 1
+        self.metrics.count("relationships")
+
+
+class _SdnGraph:
+    def __init__(self, writer: _Writer, rng: random.Random) -> None:
+        self.w = writer
+        self.rng = rng
+        self.recent_orgs: deque = deque(maxlen=RECENT_WINDOW)
+        self.recent_names: deque = deque(maxlen=1024)
+        self.hubs: list = []
+        self.hub_weights: list = []
+
+    # ------------------------------------------------------------------
+    # Names
+    # ------------------------------------------------------------------
+    def person_name(self) -> str:
+        rng = self.rng
+        if self.recent_names and rng.random() < VARIANT_RATE:
+            base = rng.choice(self.recent_names)
+            variant = " ".join(VARIANTS.get(t, t) for t in base.split(" "))
+            if variant != base:
+                return variant
+        name = f"{rng.choice(FIRST)} {rng.choice(FIRST) + ' ' if rng.random() < 0.3 else ''}{rng.choice(LAST)}"
+        self.recent_names.append(name)
+        return name
+
+    def org_name(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(ORG_WORDS).upper()} {rng.choice(ORG_TRADES).upper()} {rng.choice(ORG_SUFFIXES).upper()}"
+
+    def vessel_name(self) -> str:
+        rng = self.rng
+        return f"{rng.choice(VESSEL_WORDS)} {rng.choice(VESSEL_WORDS)} {rng.randint(1, 99)}"
+
+    def aircraft_name(self) -> str:
+        rng = self.rng
+        tail = "".join(rng.choice("ABCDEFGHIJKLMNOPQRSTUVWXYZ") for _ in range(3))
+        return f"{rng.choice(TAIL_PREFIXES)}-{tail}"
+
+    # ------------------------------------------------------------------
+    # Motifs
+    # ------------------------------------------------------------------
+    def add_hubs(self, count: int) -> None:
+        for rank in range(1, count + 1):
+            pid = self.w.party(ORGANIZATION, self.org_name(), SANCTIONED["hub"])
+            if pid is None:
+                return
+            self.hubs.append(pid)
+            self.hub_weights.append(1.0 / rank)  # Zipf: the first hub draws the most trees
+
+    def _org(self, sanctioned: float) -> Optional[str]:
+        pid = self.w.party(ORGANIZATION, self.org_name(), sanctioned)
+        if pid is not None:
+            self.recent_orgs.append(pid)
+            if self.rng.random() < 0.3:
+                self._officer(pid)
+            if self.rng.random() < 0.08:
+                self._fleet(pid)
+        return pid
+
+    def _officer(self, org: str) -> None:
+        person = self.w.party(PERSON, self.person_name(), SANCTIONED["person"])
+        if person is not None:
+            self.w.rel(person, org, LEADER_OF)
+
+    def _fleet(self, org: str) -> None:
+        size = min(MAX_FLEET, int(self.rng.paretovariate(FLEET_ALPHA)))
+        aircraft = self.rng.random() < 0.15
+        for _ in range(size):
+            craft = (self.w.party(AIRCRAFT, self.aircraft_name(), SANCTIONED["craft"]) if aircraft
+                     else self.w.party(VESSEL, self.vessel_name(), SANCTIONED["craft"]))
+            if craft is None:
+                return
+            self.w.rel(org, craft, OPERATES)
+
+    def ownership_tree(self) -> None:
+        rng = self.rng
+        size = min(MAX_TREE, int(rng.paretovariate(TREE_ALPHA)))
+        root = self._org(SANCTIONED["root"])
+        if root is None:
+            return
+        if self.hubs and rng.random() < HUB_SHARE:
+            self.w.rel(root, rng.choices(self.hubs, self.hub_weights)[0], OWNED_BY)
+        # Preferential attachment: each org appears once per child it has, plus once.
+        attach = [root]
+        for _ in range(size - 1):
+            parent = rng.choice(attach)
+            child = self._org(SANCTIONED["subsidiary"])
+            if child is None:
+                return
+            self.w.rel(child, parent, OWNED_BY)
+            attach += (parent, child)
+            if rng.random() < 0.02 and len(self.recent_orgs) > 1:
+                # A second owner elsewhere, turning the forest into a DAG.
+                self.w.rel(child, rng.choice(self.recent_orgs), OWNED_BY)
+            elif rng.random() < 0.02 and len(self.recent_orgs) > 1:
+                self.w.rel(child, rng.choice(self.recent_orgs), rng.choice(UNMAPPED_REL_TYPES))
+
+    def family_clique(self) -> None:
+        members = []
+        for _ in range(self.rng.randint(2, 6)):
+            pid = self.w.party(PERSON, self.person_name(), SANCTIONED["person"])
+            if pid is None:
+                break
+            for other in members:
+                self.w.rel(pid, other, FAMILY_MEMBER_OF)
+            members.append(pid)
+        if members and self.recent_orgs and self.rng.random() < 0.7:
+            self.w.rel(self.rng.choice(members), self.rng.choice(self.recent_orgs), LEADER_OF)
+
+    def ownership_cycle(self) -> None:
+        ring = []
+        for _ in range(self.rng.randint(3, 5)):
+            pid = self._org(SANCTIONED["subsidiary"])
+            if pid is None:
+                break
+            ring.append(pid)
+        if len(ring) >= 2:
+            for child, owner in zip(ring, ring[1:] + ring[:1]):
+                self.w.rel(child, owner, OWNED_BY)
+
+    def isolated_person(self) -> None:
+        pid = self.w.party(PERSON, self.person_name(), SANCTIONED["person"])
+        if pid is not None and self.recent_orgs and self.rng.random() < 0.1:
+            self.w.rel(pid, self.rng.choice(self.recent_orgs), self.rng.choice(UNMAPPED_REL_TYPES))
+
+    def isolated_craft(self) -> None:
+        if self.rng.random() < 0.8:
+            self.w.party(VESSEL, self.vessel_name(), SANCTIONED["craft"])
+        else:
+            self.w.party(AIRCRAFT, self.aircraft_name(), SANCTIONED["craft"])
+
+
+def generate(parties: int, seed: int = DEFAULT_SEED, out_dir: str = DEFAULT_OUT_DIR) -> None:
+    metrics = RunMetrics("generate_sdn_graph", parties=parties, seed=seed, out_dir=out_dir)
+    rng = random.Random(seed)
+    print(f"Generating {parties} parties (seed {seed}) into {out_dir}/...")
+
+    motifs = list(MOTIF_WEIGHTS)
+    weights = list(MOTIF_WEIGHTS.values())
+    with ExitStack() as stack, metrics.stage("generate"):
+        writer = _Writer(stack, out_dir, parties, rng, metrics)
+        graph = _SdnGraph(writer, rng)
+        graph.add_hubs(max(3, parties // PARTIES_PER_HUB))
+        while writer.remaining > 0:
+            getattr(graph, rng.choices(motifs, weights)[0])()
+
+    print(f"Wrote {writer.next_party - 1} parties, {writer.next_rel - 1} relationships "
+          f"and {writer.entries} sanctions entries")
+    metrics.write()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate a synthetic SDN-shaped graph as flattened CSVs")
+    parser.add_argument("--parties", type=parse_count, default=parse_count("50k"),
+                        help="Number of parties, e.g. 10k, 250000, 2.5M (default: 50k)")
+    parser.add_argument("--seed", type=int, default=DEFAULT_SEED,
+                        help=f"Random seed; same seed and size give identical files (default: {DEFAULT_SEED})")
+    parser.add_argument("--out-dir", default=DEFAULT_OUT_DIR,
+                        help=f"Directory for parties/relationships/sanctions_entries.csv (default: {DEFAULT_OUT_DIR})")
+    args = parser.parse_args()
+    generate(args.parties, seed=args.seed, out_dir=args.out_dir)
@@ -120,6 +120,19 @@ FOR doc IN UNION(
 FILTER doc != null
 RETURN doc"""
 
+# Supernodes: the most connected entities by the precomputed degreeTotal
+# counter (degree_counters.py), served from the ri_degreeTotal index.
+_SUPERNODES_QUERY = """\
+FOR doc IN UNION(
+  (FOR d IN Organization FILTER d.degreeTotal >= 50 RETURN d),
+  (FOR d IN Person       FILTER d.degreeTotal >= 50 RETURN d),
+  (FOR d IN Vessel       FILTER d.degreeTotal >= 50 RETURN d),
+  (FOR d IN Aircraft     FILTER d.degreeTotal >= 50 RETURN d)
+)
+SORT doc.degreeTotal DESC
+LIMIT 25
+RETURN doc"""
+
 # Clean portfolio: the generated non-sanctioned counterparties plus the few
 # sanctioned anchors they are exposed to. Mostly green, with a handful of
 # high/medium/low hotspots that demonstrate inferred-risk propagation.
@@ -178,6 +191,12 @@ VISUALIZER_QUERIES = [
         _scenario_union("C"),
         "Clean entities — no risk connections, expected riskLevel: low",
     ),
+    (
+        "supernodes",
+        "Supernodes (50+ relationships)",
+        _SUPERNODES_QUERY,
+        "The 25 most connected entities by their precomputed degree counters",
+    ),
 ]
 
 
@@ -1,9 +1,19 @@
+import argparse
+import hashlib
+import json
 import os
 import csv
+import sys
+from pathlib import Path
 from urllib.parse import urlparse, urlunparse
 from dotenv import load_dotenv
-from arango import ArangoClient
-from arango_rdf import ArangoRDF
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from bulk_loader import BulkImporter, pooled_client
+from common import RunMetrics, file_fingerprint, find_xml_source, relationship_key, type_edge_key
+from degree_counters import refresh_degrees
+from ontology_cache import load_ontology
+from party_directory import PARTY_DIRECTORY_PATH, PartyDirectory
 
 # Load environment variables
 load_dotenv()
@@ -38,9 +48,475 @@ SYNTHETIC_RELATIONSHIPS_CSV = "data/synthetic_relationships.csv"
 
 SYNTHETIC_ID_PREFIX = "SYN-"
 
-def load_data():
-    # Initialize ArangoDB Client
-    client = ArangoClient(hosts=ARANGO_ENDPOINT)
+# Map CSV SubType IDs to ArangoDB collections
+COLLECTION_MAP = {
+    "4": "Person",
+    "3": "Organization",
+    "1": "Vessel",
+    "2": "Aircraft"
+}
+
+# Map CSV Relationship IDs to ArangoDB edge collections
+EDGE_MAP = {
+    "15003": "owned_by",
+    "15004": "family_member_of",
+    "91725": "leader_of",
+    "92019": "operates"
+}
+
+# Mapping for ontology classes
+CLASS_MAP = {
+    "Person": "Class/4254344209254636453",
+    "Organization": "Class/2686369784577023745",
+    "Vessel": "Class/18357045211339981443",
+    "Aircraft": "Class/8751360868399758229"
+}
+
+# Materialized collection -> ontology Class lookup (one document per instance
+# collection). With --virtual-typing it replaces the per-instance type edges:
+#   DOCUMENT(CONCAT("CollectionClass/", PARSE_IDENTIFIER(v._id).collection)).class
+CLASS_LOOKUP_COLLECTION = "CollectionClass"
+
+# Fingerprints of the inputs of the last completed load, the options it ran
+# with and the document counts it left behind (see _input_manifest). A run
+# whose inputs and options match a complete manifest is a no-op.
+LOAD_MANIFEST_COLLECTION = "LoadManifest"
+LOAD_MANIFEST_KEY = "load_data"
+
+# Mapping for propagation weights
+WEIGHT_MAP = {
+    "owned_by": 1.0,
+    "leader_of": 0.8,
+    "family_member_of": 0.5,
+    "operates": 0.9
+}
+
+# Documents per import_bulk chunk and concurrent import threads (see bulk_loader.py)
+DEFAULT_BATCH_SIZE = 5000
+DEFAULT_IMPORT_WORKERS = 4
+# Documents per stream transaction with --transaction-size (0 = plain chunked imports)
+DEFAULT_TRANSACTION_SIZE = 0
+
+# Attribute holding a digest of the loader-owned fields; every document the
+# loader builds carries it, so a full load is a valid baseline for --incremental.
+CONTENT_HASH_FIELD = "contentHash"
+
+def _content_hash(doc: dict) -> str:
+    """Stable digest of a loader document (numbers normalised: 1 == 1.0)."""
+    canon = {
+        k: float(v) if isinstance(v, (int, float)) and not isinstance(v, bool) else v
+        for k, v in doc.items() if k != CONTENT_HASH_FIELD
+    }
+    payload = json.dumps(canon, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.blake2b(payload.encode("utf-8"), digest_size=8).hexdigest()
+
+def _party_doc(row: dict, synthetic: bool = False):
+    """Return (collection, document) for one flattened party row."""
+    party_id = str(row['party_id'])
+    name = str(row['primary_name'])
+    subtype = str(row['party_type'])
+    col_name = COLLECTION_MAP.get(subtype, "Entity")
+
+    doc = {
+        "_key": party_id,
+        "primaryName": name,
+        "label": name,
+        "party_id": party_id,
+    }
+
+    if synthetic:
+        doc["dataSource"] = "Synthetic"
+        doc["scenario"] = row.get("scenario", "")
+        risk_score = row.get("risk_score", "").strip()
+        if risk_score:
+            doc["riskScore"] = float(risk_score)
+    doc[CONTENT_HASH_FIELD] = _content_hash(doc)
+    return col_name, doc
+
+def _type_edge(col_name: str, key: str):
+    """Instance -> ontology Class typing edge, or None for unmapped collections."""
+    target_class = CLASS_MAP.get(col_name)
+    if not target_class:
+        return None
+    doc = {"_key": type_edge_key(col_name, key), "_from": f"{col_name}/{key}", "_to": target_class,
+           "label": "type", "_label": "type"}
+    doc[CONTENT_HASH_FIELD] = _content_hash(doc)
+    return doc
+
+def _edge_doc(row: dict, party_to_col: dict, synthetic: bool = False):
+    """Return (edge collection, document), (None, None) for unmapped relation
+    types, or (edge collection, None) when an endpoint party is unknown."""
+    from_p = row['from_party']
+    to_p = row['to_party']
+    rel_type = row['rel_type']
+    edge_col = EDGE_MAP.get(rel_type)
+
+    if not edge_col:
+        return None, None
+
+    from_col = party_to_col.get(from_p)
+    to_col = party_to_col.get(to_p)
+
+    if not from_col or not to_col:
+        return edge_col, None
+
+    doc = {
+        "_key": relationship_key(row.get('rel_id'), from_p, to_p, rel_type),
+        "_from": f"{from_col}/{from_p}",
+        "_to": f"{to_col}/{to_p}",
+        "rel_type_id": rel_type,
+        "label": edge_col,
+        "propagationWeight": WEIGHT_MAP.get(edge_col, 0.1),
+    }
+    if synthetic:
+        doc["dataSource"] = "Synthetic"
+    doc[CONTENT_HASH_FIELD] = _content_hash(doc)
+    return edge_col, doc
+
+def _iter_rows(path: str):
+    """Yield row dicts from a flattened CSV."""
+    with open(path, 'r', encoding='utf-8') as f:
+        yield from csv.DictReader(f)
+
+def _sync_ontology_labels(db):
+    # Sync Ontology Labels to 'label' attribute
+    print("Syncing ontology labels...")
+    ontology_colls = ["Class", "Property", "ObjectProperty", "Ontology", "domain", "range", "subClassOf", "type"]
+    for oc in ontology_colls:
+        if db.has_collection(oc):
+            db.aql.execute(f"FOR d IN {oc} FILTER d._label != null AND d.label == null UPDATE d WITH {{ label: d._label }} IN {oc}")
+
+def _truncate(db, collections):
+    """Empty each existing collection (the overwrite=True semantics of the full load)."""
+    for col in collections:
+        if db.has_collection(col):
+            db.collection(col).truncate()
+
+def _iter_documents(from_xml, xml_path, parse_workers, metrics, stats, party_to_col,
+                    type_edges=True):
+    """Yield (collection, document) for every party, type edge and relationship
+    the loader owns, in load order.
+
+    Real OFAC rows come first, streamed from the XML (from_xml) or read from the
+    flattened CSVs, followed by the synthetic fixtures. Parties precede the
+    relationships that reference them, so party_to_col (a PartyDirectory, the
+    only structure that grows with the dataset) is complete when each edge is
+    resolved. Relationships with an unknown endpoint are counted in
+    stats["skipped"]. With type_edges=False no instance -> Class edges are
+    produced; class membership then comes from CLASS_LOOKUP_COLLECTION.
+    """
+    stats.setdefault("skipped", 0)
+
+    def _parties(rows, synthetic):
+        for row in rows:
+            col_name, doc = _party_doc(row, synthetic=synthetic)
+            party_to_col[doc["_key"]] = col_name
+            yield col_name, doc
+            edge = _type_edge(col_name, doc["_key"]) if type_edges else None
+            if edge:
+                yield "type", edge
+            _progress("parties")
+
+    def _relationships(rows, synthetic):
+        for row in rows:
+            edge_col, doc = _edge_doc(row, party_to_col, synthetic=synthetic)
+            if doc is not None:
+                yield edge_col, doc
+            elif edge_col is not None:
+                stats["skipped"] += 1
+            _progress("relationships")
+
+    def _progress(label):
+        n = metrics.count(label)
+        if n % 10000 == 0:
+            print(f"  Streamed {n} {label}... ({metrics.rate(label):,.0f}/s)")
+
+    if from_xml:
+        from flatten_ofac import XML_PATH, iter_xml_rows
+
+        # DistinctParties precede ProfileRelationships in the document, so every
+        # real party is in party_to_col before its relationships arrive.
+        for tag, row in iter_xml_rows(xml_path or find_xml_source(XML_PATH), workers=parse_workers):
+            if tag == "DistinctParty":
+                party_id, name, party_type = row
+                yield from _parties([{"party_id": party_id, "primary_name": name or "",
+                                      "party_type": party_type or ""}], synthetic=False)
+            elif tag == "ProfileRelationship":
+                rel_id, from_p, to_p, rel_type = row
+                yield from _relationships([{"rel_id": rel_id, "from_party": from_p,
+                                            "to_party": to_p, "rel_type": rel_type}], synthetic=False)
+        sources = ()
+    else:
+        sources = ((PARTIES_CSV, _parties), (RELATIONSHIPS_CSV, _relationships))
+
+    for path, handler, synthetic in (
+        *((path, handler, False) for path, handler in sources),
+        (SYNTHETIC_PARTIES_CSV, _parties, True),
+        (SYNTHETIC_RELATIONSHIPS_CSV, _relationships, True),
+    ):
+        if not os.path.exists(path):
+            print(f"  [SKIP] {path} not found")
+            continue
+        yield from handler(_iter_rows(path), synthetic)
+
+def _write_class_lookup(db, virtual_typing):
+    """Materialize CLASS_LOOKUP_COLLECTION: instance collection -> ontology Class."""
+    if not db.has_collection(CLASS_LOOKUP_COLLECTION):
+        db.create_collection(CLASS_LOOKUP_COLLECTION)
+    docs = [{"_key": col, "collection": col, "class": cls,
+             "typing": "virtual" if virtual_typing else "edges"}
+            for col, cls in CLASS_MAP.items()]
+    db.collection(CLASS_LOOKUP_COLLECTION).import_bulk(docs, on_duplicate="replace")
+    print(f"Class lookup written to {CLASS_LOOKUP_COLLECTION} "
+          f"({'virtual typing, no per-instance type edges' if virtual_typing else 'type edges kept'})")
+
+def _save_directory(directory):
+    directory.save()
+    print(f"Party directory written to {PARTY_DIRECTORY_PATH} ({len(directory)} parties)")
+
+def _load_full(db, from_xml, xml_path, batch_size, import_workers, parse_workers, metrics,
+               virtual_typing=False, transaction_size=DEFAULT_TRANSACTION_SIZE, sync_labels=True):
+    """Truncate the loader's collections and stream every document back in.
+
+    Documents from _iter_documents (XML stream or flattened CSVs) go straight
+    to a BulkImporter in fixed-size chunks while reading continues, so no
+    per-collection lists are built; only party_to_col grows with the data.
+    With transaction_size, each party commits together with its type edge in
+    stream transactions of about that many documents.
+    """
+    source = (xml_path or "the OFAC XML") if from_xml else "the flattened CSVs"
+    print(f"Streaming {source} into ArangoDB "
+          f"(batch size {batch_size}, {import_workers} import threads)...")
+
+    with metrics.stage("truncate"):
+        _truncate(db, list(COLLECTION_MAP.values()) + list(EDGE_MAP.values()) + ["type"])
+
+    stats = {}
+    directory = PartyDirectory()
+    with metrics.stage("stream"), \
+            BulkImporter(db, batch_size=batch_size, workers=import_workers,
+                         transaction_size=transaction_size) as importer:
+        for col, doc in _iter_documents(from_xml, xml_path, parse_workers, metrics, stats,
+                                        directory, type_edges=not virtual_typing):
+            if col != "type":  # a type edge belongs to the party just before it
+                importer.boundary()
+            importer.add(col, doc)
+    _save_directory(directory)
+
+    print(importer.report())
+    if stats["skipped"]:
+        print(f"  [WARN] skipped {stats['skipped']} relationships (unknown party IDs)")
+
+    with metrics.stage("degrees"):
+        print(f"Degree counters: {refresh_degrees(db)} vertices updated")
+
+    if sync_labels:
+        with metrics.stage("sync_labels"):
+            _sync_ontology_labels(db)
+
+# ---------------------------------------------------------------------------
+# Incremental mode (--incremental)
+# ---------------------------------------------------------------------------
+
+_OWNED_FILTER = "FILTER d.dataSource == null OR d.dataSource == 'Synthetic'"
+SCAN_LOADED_QUERY = f"FOR d IN @@col {_OWNED_FILTER} RETURN [d._key, d.{CONTENT_HASH_FIELD}]"
+_SCAN_LOADED_TYPE_QUERY = (
+    f"FOR d IN @@col {_OWNED_FILTER} FILTER PARSE_IDENTIFIER(d._from).collection IN @instance_cols "
+    f"RETURN [d._key, d.{CONTENT_HASH_FIELD}]"
+)
+
+def _scan_loaded(db, col: str):
+    """Return {_key: contentHash or None} for what the loader previously wrote to `col`.
+
+    Documents written by other stages (e.g. dataSource "CleanPortfolio") and
+    ontology typing edges are excluded, so they are never touched.
+    """
+    if not db.has_collection(col):
+        return {}
+    query, bind_vars = SCAN_LOADED_QUERY, {"@col": col}
+    if col == "type":
+        query = _SCAN_LOADED_TYPE_QUERY
+        bind_vars["instance_cols"] = list(COLLECTION_MAP.values())
+    cursor = db.aql.execute(query, bind_vars=bind_vars, batch_size=10000, stream=True)
+    return {key: h for key, h in cursor}
+
+def _remove_keys(db, col: str, keys, batch_size: int, endpoints=None) -> None:
+    """Remove `keys` from `col`; add removed edges' _from/_to to the `endpoints` set if given."""
+    keys = list(keys)
+    returning = " RETURN [OLD._from, OLD._to]" if endpoints is not None else ""
+    for i in range(0, len(keys), batch_size):
+        cursor = db.aql.execute(
+            f"FOR k IN @keys REMOVE k IN @@col OPTIONS {{ ignoreErrors: true }}{returning}",
+            bind_vars={"@col": col, "keys": keys[i:i + batch_size]})
+        if endpoints is not None:
+            endpoints.update(v for pair in cursor for v in pair if v)
+
+def _load_incremental(db, from_xml, xml_path, batch_size, import_workers, parse_workers, metrics,
+                      virtual_typing=False, transaction_size=DEFAULT_TRANSACTION_SIZE,
+                      sync_labels=True):
+    """Apply only the difference between the source data and what is loaded.
+
+    Every loader document has a deterministic _key and carries a contentHash
+    (full loads write it too); documents whose hash is unchanged are not sent
+    at all. Changed vertices
+    are merged with on_duplicate="update", so riskScore/inferredRisk written
+    by later stages survive; changed edges are replaced. Nothing is
+    truncated, and changes are applied in an order that never leaves
+    dangling edges: changed edges are buffered (at most batch_size *
+    import_workers of them) and only written once the vertices streamed before
+    them are, then edge removals, then vertex removals. With transaction_size each phase commits
+    in stream transactions of about that many documents. Degree counters are
+    recounted only for the endpoints of upserted and removed relationships.
+    """
+    vertex_cols = list(COLLECTION_MAP.values())
+    edge_cols = list(EDGE_MAP.values()) + ["type"]
+    print("Incremental load: diffing source documents against the database...")
+
+    with metrics.stage("scan_existing"):
+        existing = {col: _scan_loaded(db, col) for col in vertex_cols + edge_cols}
+
+    stats = {}
+    directory = PartyDirectory()
+    seen = {col: set() for col in existing}
+    changed = {col: [0, 0, 0] for col in existing}  # inserted, updated, unchanged
+    touched = set()  # endpoints whose relationship degree may have changed
+    # Changed edges wait here until the vertices streamed before them are written.
+    pending_edges = []
+    edge_buffer = batch_size * max(1, import_workers)
+
+    def _release_edges():
+        vertex_importer.drain()
+        for col, doc in pending_edges:
+            edge_importer.boundary()
+            edge_importer.add(col, doc)
+            if col != "type":
+                touched.update((doc["_from"], doc["_to"]))
+        pending_edges.clear()
+
+    with metrics.stage("upsert"), \
+            BulkImporter(db, batch_size=batch_size, workers=import_workers,
+                         on_duplicate="update", transaction_size=transaction_size) as vertex_importer, \
+            BulkImporter(db, batch_size=batch_size, workers=import_workers,
+                         transaction_size=transaction_size) as edge_importer:
+        for col, doc in _iter_documents(from_xml, xml_path, parse_workers, metrics, stats,
+                                        directory, type_edges=not virtual_typing):
+            # Parties of an unmapped subtype (routed to "Entity") and edges to
+            # them have no collection this mode diffs; skip them, don't fail.
+            if col not in seen or (col in EDGE_MAP.values() and not all(
+                    doc[end].partition("/")[0] in vertex_cols for end in ("_from", "_to"))):
+                stats["skipped"] += 1
+                continue
+            key = doc["_key"]
+            seen[col].add(key)
+            if key not in existing[col]:
+                changed[col][0] += 1
+            elif existing[col][key] != doc[CONTENT_HASH_FIELD]:
+                changed[col][1] += 1
+            else:
+                changed[col][2] += 1
+                continue
+            if col in vertex_cols:
+                vertex_importer.boundary()
+                vertex_importer.add(col, doc)
+            else:
+                pending_edges.append((col, doc))
+                if len(pending_edges) >= edge_buffer:
+                    _release_edges()
+        _release_edges()
+
+    removed = {}
+    with metrics.stage("remove_stale"):
+        for col in edge_cols + vertex_cols:
+            stale = set(existing[col]) - seen[col]
+            _remove_keys(db, col, stale, batch_size,
+                         endpoints=touched if col in EDGE_MAP.values() else None)
+            removed[col] = len(stale)
+    _save_directory(directory)
+
+    with metrics.stage("degrees"):
+        print(f"Degree counters: {refresh_degrees(db, touched, batch_size)} of "
+              f"{len(touched)} touched vertices updated")
+
+    for col in vertex_cols + edge_cols:
+        inserted, updated, unchanged = changed[col]
+        metrics.count(f"{col} changed", inserted + updated + removed[col])
+        print(f"  {col}: {inserted} inserted, {updated} updated, "
+              f"{removed[col]} removed, {unchanged} unchanged")
+    if stats["skipped"]:
+        print(f"  [WARN] skipped {stats['skipped']} parties/relationships "
+              f"(unmapped party subtype or unknown party IDs)")
+
+    if sync_labels:
+        with metrics.stage("sync_labels"):
+            _sync_ontology_labels(db)
+
+# ---------------------------------------------------------------------------
+# Load manifest
+# ---------------------------------------------------------------------------
+
+def _input_manifest(from_xml, xml_path, virtual_typing):
+    """Fingerprint every input this run would read (None for a missing file)."""
+    if from_xml:
+        from flatten_ofac import XML_PATH
+
+        sources = [xml_path or find_xml_source(XML_PATH)]
+    else:
+        sources = [PARTIES_CSV, RELATIONSHIPS_CSV]
+    inputs = {}
+    for path in [ONTOLOGY_PATH, *sources, SYNTHETIC_PARTIES_CSV, SYNTHETIC_RELATIONSHIPS_CSV]:
+        if not os.path.exists(path):
+            inputs[path] = None
+            continue
+        fp = file_fingerprint(path)
+        if path.endswith(".csv"):
+            fp["rows"] = max(0, fp["lines"] - 1)  # minus the header
+        inputs[path] = fp
+    # Paths are kept as values so attribute names stay plain identifiers.
+    return {
+        "inputs": [{"path": path, **(fp or {"missing": True})} for path, fp in inputs.items()],
+        "options": {"from_xml": from_xml, "virtual_typing": virtual_typing},
+    }
+
+def _read_manifest(db):
+    if not db.has_collection(LOAD_MANIFEST_COLLECTION):
+        return None
+    return db.collection(LOAD_MANIFEST_COLLECTION).get(LOAD_MANIFEST_KEY)
+
+def _write_manifest(db, doc):
+    if not db.has_collection(LOAD_MANIFEST_COLLECTION):
+        db.create_collection(LOAD_MANIFEST_COLLECTION)
+    db.collection(LOAD_MANIFEST_COLLECTION).insert(
+        {"_key": LOAD_MANIFEST_KEY, **doc}, overwrite_mode="replace", silent=True)
+
+def _ontology_digest(manifest):
+    for entry in manifest.get("inputs", []):
+        if entry["path"] == ONTOLOGY_PATH:
+            return entry.get("blake2b")
+    return None
+
+def _load_is_current(db, previous, current):
+    """True when the last load completed from the same inputs with the same options
+    and its collections still hold at least the documents it left behind (later
+    stages only add their own documents)."""
+    if not previous or previous.get("status") != "complete":
+        return False
+    if previous.get("inputs") != current["inputs"] or previous.get("options") != current["options"]:
+        return False
+    for col, n in previous.get("counts", {}).items():
+        if not db.has_collection(col) or db.collection(col).count() < n:
+            return False
+    return db.has_graph("KnowledgeGraph")
+
+def load_data(from_xml=False, xml_path=None, batch_size=DEFAULT_BATCH_SIZE,
+              import_workers=DEFAULT_IMPORT_WORKERS, parse_workers=1, incremental=False,
+              virtual_typing=False, transaction_size=DEFAULT_TRANSACTION_SIZE, force=False):
+    metrics = RunMetrics("load_data", from_xml=from_xml, incremental=incremental,
+                         virtual_typing=virtual_typing, transaction_size=transaction_size,
+                         batch_size=batch_size, import_workers=import_workers,
+                         parse_workers=parse_workers)
+
+    # Initialize ArangoDB Client; the connection pool is sized for the import threads.
+    client = pooled_client(ARANGO_ENDPOINT, workers=import_workers)
     sys_db = client.db("_system", username=ARANGO_USERNAME, password=ARANGO_PASSWORD)
     
     # Create database if not exists
@@ -48,9 +524,19 @@ def load_data():
         sys_db.create_database(ARANGO_DATABASE)
     
     db = client.db(ARANGO_DATABASE, username=ARANGO_USERNAME, password=ARANGO_PASSWORD)
-    
-    # Initialize ArangoRDF
-    adp = ArangoRDF(db)
+
+    with metrics.stage("manifest"):
+        manifest = _input_manifest(from_xml, xml_path, virtual_typing)
+        previous = _read_manifest(db)
+    if not force and _load_is_current(db, previous, manifest):
+        print(f"Inputs unchanged since the load at {previous['loadedAt']} — nothing to do "
+              f"(use --force to reload).")
+        metrics.write()
+        return
+    ontology_digest = _ontology_digest(manifest)
+    labels_synced = (previous or {}).get("labelsSynced")
+    # Until this load completes the stored manifest must not match any run.
+    _write_manifest(db, {"status": "loading", "labelsSynced": labels_synced})
 
     # The ontology is static — only load it when the graph doesn't yet exist.
     # arango_rdf always calls create_edge_definition unconditionally, which raises
@@ -58,180 +544,38 @@ def load_data():
     if db.has_graph("OntologyGraph"):
         print(f"OntologyGraph already exists — skipping ontology load.")
     else:
-        from rdflib import Graph as RDFGraph
-
+        # Restored from the PGT dump cached for this OWL hash when there is one
+        # (see ontology_cache.py); otherwise parsed with rdflib and cached.
         print(f"Loading ontology from {ONTOLOGY_PATH}...")
-        rdf_g = RDFGraph()
-        rdf_g.parse(ONTOLOGY_PATH, format="xml")
-        adp.rdf_to_arangodb_by_pgt(name="OntologyGraph", rdf_graph=rdf_g)
+        with metrics.stage("ontology"):
+            load_ontology(db, ONTOLOGY_PATH, ontology_digest)
         print("Ontology loaded.")
+        labels_synced = None
 
     # Delete the redundant SentriesRisk graph if it was created previously
     if db.has_graph("SentriesRisk"):
         db.delete_graph("SentriesRisk")
         print("Deleted redundant SentriesRisk graph.")
 
-    print("Now importing CSV data...")
-    
-    # Map CSV SubType IDs to ArangoDB collections
-    collection_map = {
-        "4": "Person",
-        "3": "Organization",
-        "1": "Vessel",
-        "2": "Aircraft"
-    }
-    
-    # Map CSV Relationship IDs to ArangoDB edge collections
-    edge_map = {
-        "15003": "owned_by",
-        "15004": "family_member_of",
-        "91725": "leader_of",
-        "92019": "operates"
-    }
-
     # Ensure collections exist
-    for col in list(collection_map.values()) + list(edge_map.values()):
+    for col in list(COLLECTION_MAP.values()) + list(EDGE_MAP.values()):
         if not db.has_collection(col):
-            if col in edge_map.values():
+            if col in EDGE_MAP.values():
                 db.create_collection(col, edge=True)
             else:
                 db.create_collection(col)
 
-    # Batch Import Parties
-    print("Importing parties in batches...")
-    batches = {}
-    party_to_col = {}
-
-    def _ingest_parties_csv(path: str, batches: dict, party_to_col: dict, synthetic: bool = False):
-        if not os.path.exists(path):
-            print(f"  [SKIP] {path} not found")
-            return
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                party_id = str(row['party_id'])
-                name = str(row['primary_name'])
-                subtype = str(row['party_type'])
-                col_name = collection_map.get(subtype, "Entity")
-
-                doc = {
-                    "_key": party_id,
-                    "primaryName": name,
-                    "label": name,
-                    "party_id": party_id,
-                }
-
-                if synthetic:
-                    doc["dataSource"] = "Synthetic"
-                    doc["scenario"] = row.get("scenario", "")
-                    risk_score = row.get("risk_score", "").strip()
-                    if risk_score:
-                        doc["riskScore"] = float(risk_score)
-
-                if col_name not in batches:
-                    batches[col_name] = []
-                batches[col_name].append(doc)
-                party_to_col[party_id] = col_name
-
-    _ingest_parties_csv(PARTIES_CSV, batches, party_to_col, synthetic=False)
-    print(f"  Loaded real parties from {PARTIES_CSV}")
-
-    _ingest_parties_csv(SYNTHETIC_PARTIES_CSV, batches, party_to_col, synthetic=True)
-    print(f"  Loaded synthetic parties from {SYNTHETIC_PARTIES_CSV}")
-
-    # Mapping for ontology classes
-    class_map = {
-        "Person": "Class/4254344209254636453",
-        "Organization": "Class/2686369784577023745",
-        "Vessel": "Class/18357045211339981443",
-        "Aircraft": "Class/8751360868399758229"
-    }
-
-    all_type_edges = []
-    for col_name, docs in batches.items():
-        print(f"Loading {len(docs)} to {col_name}...")
-        db.collection(col_name).import_bulk(docs, overwrite=True)
-        
-        target_class = class_map.get(col_name)
-        if target_class:
-            all_type_edges.extend([
-                {"_from": f"{col_name}/{doc['_key']}", "_to": target_class, "label": "type", "_label": "type"}
-                for doc in docs
-            ])
-            
-    if all_type_edges:
-        print(f"Loading {len(all_type_edges)} total type edges...")
-        db.collection("type").import_bulk(all_type_edges, overwrite=True)
-
-    # Sync Ontology Labels to 'label' attribute
-    print("Syncing ontology labels...")
-    ontology_colls = ["Class", "Property", "ObjectProperty", "Ontology", "domain", "range", "subClassOf", "type"]
-    for oc in ontology_colls:
-        if db.has_collection(oc):
-            db.aql.execute(f"FOR d IN {oc} FILTER d._label != null AND d.label == null UPDATE d WITH {{ label: d._label }} IN {oc}")
-
-    # Batch Import Relationships
-    print("Importing relationships in batches...")
-    edge_batches = {}
-
-    def _ingest_relationships_csv(path: str, edge_batches: dict, party_to_col: dict, synthetic: bool = False):
-        if not os.path.exists(path):
-            print(f"  [SKIP] {path} not found")
-            return
-        skipped = 0
-        with open(path, 'r', encoding='utf-8') as f:
-            reader = csv.DictReader(f)
-            for row in reader:
-                from_p = row['from_party']
-                to_p = row['to_party']
-                rel_type = row['rel_type']
-                edge_col = edge_map.get(rel_type)
-
-                if not edge_col:
-                    continue
-
-                from_col = party_to_col.get(from_p)
-                to_col = party_to_col.get(to_p)
-
-                if not from_col or not to_col:
-                    skipped += 1
-                    continue
-
-                doc = {
-                    "_from": f"{from_col}/{from_p}",
-                    "_to": f"{to_col}/{to_p}",
-                    "rel_type_id": rel_type,
-                    "label": edge_col,
-                }
-                if synthetic:
-                    doc["dataSource"] = "Synthetic"
-
-                if edge_col not in edge_batches:
-                    edge_batches[edge_col] = []
-                edge_batches[edge_col].append(doc)
-        if skipped:
-            print(f"  [WARN] {path}: skipped {skipped} relationships (unknown party IDs)")
-
-    _ingest_relationships_csv(RELATIONSHIPS_CSV, edge_batches, party_to_col, synthetic=False)
-    print(f"  Loaded real relationships from {RELATIONSHIPS_CSV}")
-
-    _ingest_relationships_csv(SYNTHETIC_RELATIONSHIPS_CSV, edge_batches, party_to_col, synthetic=True)
-    print(f"  Loaded synthetic relationships from {SYNTHETIC_RELATIONSHIPS_CSV}")
-
-    # Mapping for propagation weights
-    weight_map = {
-        "owned_by": 1.0,
-        "leader_of": 0.8,
-        "family_member_of": 0.5,
-        "operates": 0.9
-    }
-
-    for edge_col, docs in edge_batches.items():
-        print(f"Loading {len(docs)} to {edge_col}...")
-        weight = weight_map.get(edge_col, 0.1)
-        for doc in docs:
-            doc["propagationWeight"] = weight
-        db.collection(edge_col).import_bulk(docs, overwrite=True)
+    # The label passes only touch ontology documents; skip them while the ontology is unchanged.
+    sync_labels = force or ontology_digest is None or labels_synced != ontology_digest
+    if not sync_labels:
+        print("Ontology unchanged — skipping label sync.")
+    if incremental:
+        _load_incremental(db, from_xml, xml_path, batch_size, import_workers, parse_workers, metrics,
+                          virtual_typing, transaction_size, sync_labels)
+    else:
+        _load_full(db, from_xml, xml_path, batch_size, import_workers, parse_workers, metrics,
+                   virtual_typing, transaction_size, sync_labels)
+    _write_class_lookup(db, virtual_typing)
 
     # Define 3 Graphs
     print("Defining graphs...")
@@ -312,7 +656,51 @@ def load_data():
         for ed in knowledge_edges:
             _upsert_edge_def(g, ed['edge_collection'], ed['from_vertex_collections'], ed['to_vertex_collections'])
     print("Created/Updated KnowledgeGraph")
+
+    counted = list(COLLECTION_MAP.values()) + list(EDGE_MAP.values()) + ["type"]
+    _write_manifest(db, {
+        **manifest,
+        "status": "complete",
+        "loadedAt": metrics.started_at.isoformat(timespec="seconds"),
+        "labelsSynced": ontology_digest,
+        "counts": {col: db.collection(col).count() for col in counted if db.has_collection(col)},
+    })
+    print(f"Load manifest written to {LOAD_MANIFEST_COLLECTION}/{LOAD_MANIFEST_KEY}")
     print("Data loading and graph definitions completed.")
+    metrics.write()
 
 if __name__ == "__main__":
-    load_data()
+    parser = argparse.ArgumentParser(description="Load ontology, OFAC parties and synthetic fixtures")
+    parser.add_argument(
+        "--from-xml",
+        action="store_true",
+        help="Stream parties/relationships straight from the OFAC XML instead of the flattened CSVs",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Upsert only changed documents (by contentHash) and remove vanished ones "
+             "instead of truncating and reloading every collection",
+    )
+    parser.add_argument(
+        "--virtual-typing",
+        action="store_true",
+        help=f"Skip the per-instance type edges; class membership comes from {CLASS_LOOKUP_COLLECTION}",
+    )
+    parser.add_argument("--xml", default=None, help="OFAC XML for --from-xml (plain, .gz, .xz or .zip)")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"Documents per import_bulk chunk (default: {DEFAULT_BATCH_SIZE})")
+    parser.add_argument("--import-workers", type=int, default=DEFAULT_IMPORT_WORKERS,
+                        help=f"Concurrent import_bulk requests across collections (default: {DEFAULT_IMPORT_WORKERS})")
+    parser.add_argument("--parse-workers", type=int, default=1,
+                        help="XML parse processes with --from-xml (see flatten_ofac.py --workers)")
+    parser.add_argument("--transaction-size", type=int, default=DEFAULT_TRANSACTION_SIZE,
+                        help="Commit documents in stream transactions of about this many docs, "
+                             "each party together with its type edge (default: 0, plain imports)")
+    parser.add_argument("--force", action="store_true",
+                        help=f"Reload even when the inputs match the manifest in {LOAD_MANIFEST_COLLECTION}")
+    args = parser.parse_args()
+    load_data(from_xml=args.from_xml, xml_path=args.xml, batch_size=args.batch_size,
+              import_workers=args.import_workers, parse_workers=max(1, args.parse_workers),
+              incremental=args.incremental, virtual_typing=args.virtual_typing,
+              transaction_size=max(0, args.transaction_size), force=args.force)
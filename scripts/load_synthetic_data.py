@@ -5,8 +5,9 @@ Loads synthetic demo parties and relationships from:
   data/synthetic_parties.csv
   data/synthetic_relationships.csv
 
-Runs after the real data is in place. Safe to re-run (idempotent via overwrite=True).
-Does NOT reload the ontology or touch real data collections.
+Runs after the real data is in place. Safe to re-run: parties are keyed by
+party_id and edges by a deterministic key, so re-runs replace the same
+documents. Does NOT reload the ontology or touch real OFAC documents.
 
 Run:
     python scripts/load_synthetic_data.py
@@ -21,10 +22,17 @@ import sys
 from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).resolve().parent))
-from common import apply_config_to_env, get_arango_config, load_dotenv, sanitize_url
+from common import apply_config_to_env, get_arango_config, load_dotenv, relationship_key, sanitize_url
+from degree_counters import refresh_degrees
+from load_data import WEIGHT_MAP
+from party_directory import PARTY_DIRECTORY_PATH, PartyDirectory, resolve_collections
 
 from arango import ArangoClient
 
+INIT_INFERRED_RISK_QUERY = """FOR d IN @@col
+    FILTER d.dataSource == 'Synthetic'
+    UPDATE d WITH { inferredRisk: d.riskScore || 0 } IN @@col"""
+
 SYNTHETIC_PARTIES_CSV = "data/synthetic_parties.csv"
 SYNTHETIC_RELATIONSHIPS_CSV = "data/synthetic_relationships.csv"
 
@@ -55,13 +63,6 @@ def load_synthetic_data():
     batches: dict[str, list] = {}
     party_to_col: dict[str, str] = {}
 
-    # First build party_to_col for ALL real parties (needed for cross-refs in relationships)
-    for coll in COLLECTION_MAP.values():
-        if db.has_collection(coll):
-            cursor = db.aql.execute(f"FOR d IN {coll} RETURN d._key")
-            for key in cursor:
-                party_to_col[key] = coll
-
     with open(SYNTHETIC_PARTIES_CSV, encoding="utf-8") as f:
         for row in csv.DictReader(f):
             party_id = str(row["party_id"])
@@ -81,9 +82,25 @@ def load_synthetic_data():
             batches.setdefault(col_name, []).append(doc)
             party_to_col[party_id] = col_name
 
+    # Resolve the real parties the fixtures link to (one batched lookup of just
+    # those keys, hinted by the directory load_data.py saves) — no key scans.
+    with open(SYNTHETIC_RELATIONSHIPS_CSV, encoding="utf-8") as f:
+        referenced = {
+            p for row in csv.DictReader(f) for p in (row["from_party"], row["to_party"])
+            if p not in party_to_col
+        }
+    directory = PartyDirectory.load()
+    if directory is None:
+        print(f"  [INFO] {PARTY_DIRECTORY_PATH} not found — probing every party collection")
+    party_to_col.update(resolve_collections(db, referenced, COLLECTION_MAP.values(), directory))
+    if directory is not None:
+        for party_id, col_name in party_to_col.items():
+            directory[party_id] = col_name
+        directory.save()
+
     for col_name, docs in batches.items():
         if db.has_collection(col_name):
-            db.collection(col_name).import_bulk(docs, overwrite=True)
+            db.collection(col_name).import_bulk(docs, on_duplicate="replace")
             print(f"  Upserted {len(docs)} synthetic {col_name} documents")
 
     # ------------------------------------------------------------------
@@ -112,35 +129,34 @@ def load_synthetic_data():
                 continue
 
             doc = {
+                "_key": relationship_key(row.get("rel_id"), from_p, to_p, rel_type),
                 "_from": f"{from_col}/{from_p}",
                 "_to": f"{to_col}/{to_p}",
                 "rel_type_id": rel_type,
                 "label": edge_col,
+                "propagationWeight": WEIGHT_MAP.get(edge_col, 0.1),
                 "dataSource": "Synthetic",
             }
             edge_batches.setdefault(edge_col, []).append(doc)
 
     for edge_col, docs in edge_batches.items():
         if db.has_collection(edge_col):
-            db.collection(edge_col).import_bulk(docs, overwrite=True)
+            db.collection(edge_col).import_bulk(docs, on_duplicate="replace")
             print(f"  Upserted {len(docs)} synthetic {edge_col} edges")
 
     if skipped:
         print(f"  Skipped {skipped} relationships with unresolved party IDs")
 
+    endpoints = {v for docs in edge_batches.values() for doc in docs for v in (doc["_from"], doc["_to"])}
+    print(f"  Degree counters: {refresh_degrees(db, endpoints)} vertices updated")
+
     # ------------------------------------------------------------------
     # 3. Initialise inferredRisk on synthetic parties (riskScore || 0)
     # ------------------------------------------------------------------
     print("\nInitialising inferredRisk on synthetic parties...")
     for col_name in COLLECTION_MAP.values():
         if db.has_collection(col_name):
-            db.aql.execute(
-                f"""
-                FOR d IN {col_name}
-                    FILTER d.dataSource == 'Synthetic'
-                    UPDATE d WITH {{ inferredRisk: d.riskScore || 0 }} IN {col_name}
-                """
-            )
+            db.aql.execute(INIT_INFERRED_RISK_QUERY, bind_vars={"@col": col_name})
 
     print("\nDone. Now run: python scripts/calculate_inferred_risk.py")
 
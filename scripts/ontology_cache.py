@@ -0,0 +1,156 @@
+"""
+ontology_cache.py
+
+Pre-serialized copy of the PGT-mapped ontology, keyed by the OWL file hash.
+
+Loading sentries_ontology.owl means an rdflib RDF/XML parse plus ArangoRDF's
+PGT transformation, which dominates the startup of a fresh database. After
+the first such load the documents it wrote (Class, Property, domain, range,
+subClassOf, type, ...) and the OntologyGraph definition are dumped to
+data/cache/ontology-<digest>.json.gz. Later loads of the same OWL
+file bulk-insert that dump instead and never import rdflib or arango_rdf.
+
+The cache also records the arango_rdf version that produced it; a dump from
+a different version is treated as a miss. Point the ONTOLOGY_CACHE_DIR
+environment variable at a persisted directory to share the cache between
+ephemeral environments.
+
+Usage:
+    source = load_ontology(db, "sentries_ontology.owl", digest)  # "cache" or "rdflib"
+"""
+
+from __future__ import annotations
+
+import gzip
+import json
+import os
+from importlib import metadata
+from typing import Any, Dict, List, Optional
+
+# Default cache directory; the ONTOLOGY_CACHE_DIR environment variable overrides it.
+ONTOLOGY_CACHE_DIR = "data/cache"
+ONTOLOGY_GRAPH = "OntologyGraph"
+FORMAT_VERSION = 1
+
+# Documents per import_bulk request when restoring
+_RESTORE_BATCH = 5000
+
+
+def cache_path(digest: str) -> str:
+    cache_dir = os.getenv("ONTOLOGY_CACHE_DIR") or ONTOLOGY_CACHE_DIR
+    return os.path.join(cache_dir, f"ontology-{digest}.json.gz")
+
+
+def _arango_rdf_version() -> Optional[str]:
+    try:
+        return metadata.version("arango_rdf")
+    except metadata.PackageNotFoundError:
+        return None
+
+
+def read_cache(digest: str) -> Optional[Dict[str, Any]]:
+    """The cached dump for `digest`, or None if absent, unreadable or stale."""
+    path = cache_path(digest)
+    if not os.path.exists(path):
+        return None
+    try:
+        with gzip.open(path, "rt", encoding="utf-8") as f:
+            cache = json.load(f)
+    except (OSError, ValueError) as e:
+        print(f"  [WARN] ignoring unreadable ontology cache {path}: {e}")
+        return None
+    if cache.get("format") != FORMAT_VERSION or cache.get("digest") != digest:
+        return None
+    if cache.get("arango_rdf") != _arango_rdf_version():
+        print(f"  Ontology cache was built with arango_rdf {cache.get('arango_rdf')}; rebuilding.")
+        return None
+    return cache
+
+
+def dump_graph(db, digest: str, skip: Optional[List[str]] = None) -> Optional[str]:
+    """Write every document of OntologyGraph's collections to the cache for `digest`.
+
+    Collections in `skip` (ones that held documents before the ontology load)
+    make the dump unsafe, since it could not tell ontology documents from the
+    rest; nothing is written then and None is returned.
+    """
+    graph = db.graph(ONTOLOGY_GRAPH)
+    edge_definitions = [
+        {"edge_collection": ed.get("edge_collection", ed.get("collection")),
+         "from_vertex_collections": sorted(ed["from_vertex_collections"]),
+         "to_vertex_collections": sorted(ed["to_vertex_collections"])}
+        for ed in graph.edge_definitions()
+    ]
+    orphans = sorted(graph.properties().get("orphan_collections", []))
+    edge_cols = {ed["edge_collection"] for ed in edge_definitions}
+    cols = sorted(set(graph.vertex_collections()) | edge_cols)
+    if set(cols) & set(skip or ()):
+        return None
+
+    collections = {}
+    for col in cols:
+        docs = []
+        for doc in db.collection(col).all():
+            doc.pop("_id", None)
+            doc.pop("_rev", None)
+            docs.append(doc)
+        collections[col] = {"edge": col in edge_cols, "docs": sorted(docs, key=lambda d: d["_key"])}
+
+    path = cache_path(digest)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp = f"{path}.tmp"
+    with gzip.open(tmp, "wt", encoding="utf-8") as f:
+        json.dump({"format": FORMAT_VERSION, "digest": digest, "arango_rdf": _arango_rdf_version(),
+                   "edge_definitions": edge_definitions, "orphan_collections": orphans,
+                   "collections": collections}, f, separators=(",", ":"))
+    os.replace(tmp, path)
+    return path
+
+
+def restore(db, cache: Dict[str, Any]) -> int:
+    """Bulk-insert a cached dump and recreate OntologyGraph; return the document count."""
+    total = 0
+    for col, spec in cache["collections"].items():
+        if not db.has_collection(col):
+            db.create_collection(col, edge=spec["edge"])
+        docs = spec["docs"]
+        for i in range(0, len(docs), _RESTORE_BATCH):
+            db.collection(col).import_bulk(docs[i:i + _RESTORE_BATCH], on_duplicate="replace")
+        total += len(docs)
+    db.create_graph(ONTOLOGY_GRAPH, edge_definitions=cache["edge_definitions"],
+                    orphan_collections=cache["orphan_collections"])
+    return total
+
+
+def _occupied_collections(db) -> List[str]:
+    return [c["name"] for c in db.collections()
+            if not c["system"] and db.collection(c["name"]).count()]
+
+
+def load_ontology(db, owl_path: str, digest: Optional[str]) -> str:
+    """Create OntologyGraph from `owl_path`, from the cache when possible.
+
+    Returns "cache" on a hit. On a miss the OWL file is parsed with rdflib and
+    mapped with ArangoRDF PGT, the result is dumped for next time, and
+    "rdflib" is returned. Without a `digest` nothing is cached.
+    """
+    cache = read_cache(digest) if digest else None
+    if cache is not None:
+        n = restore(db, cache)
+        print(f"Ontology restored from {cache_path(digest)} ({n} documents).")
+        return "cache"
+
+    from arango_rdf import ArangoRDF
+    from rdflib import Graph as RDFGraph
+
+    occupied = _occupied_collections(db) if digest else []
+    rdf_g = RDFGraph()
+    rdf_g.parse(owl_path, format="xml")
+    ArangoRDF(db).rdf_to_arangodb_by_pgt(name=ONTOLOGY_GRAPH, rdf_graph=rdf_g)
+    if digest:
+        path = dump_graph(db, digest, skip=occupied)
+        if path:
+            print(f"Ontology cache written to {path}")
+        else:
+            print("  [SKIP] ontology cache not written (ontology collections already held documents)")
+    return "rdflib"
@@ -0,0 +1,211 @@
+"""
+party_directory.py
+
+Compact party key -> vertex collection directory.
+
+OFAC party keys are FixedRef integers, so each entry is packed into one
+unsigned 64-bit word, `key << 8 | collection_code`, kept in a sorted
+`array('Q')` and looked up with bisect: 8 bytes per party, versus roughly 150
+for a dict of strings. The few non-numeric keys (SYN-... fixtures, overlay
+IDs) live in a small dict. load_data.py persists the directory to
+data/party_directory.bin after each load so other loaders can resolve party
+collections without scanning the server.
+
+Usage:
+    directory = PartyDirectory()
+    directory["15117"] = "Person"
+    directory.get("15117")          # "Person"
+    directory.save()
+    directory = PartyDirectory.load()  # None if never written
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import sys
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PARTY_DIRECTORY_PATH = "data/party_directory.bin"
+FORMAT_VERSION = 1
+
+_MAX_INT_KEY = 1 << 56
+_CODE_MASK = 0xFF
+# Below this many pending numeric keys, insert them in place instead of re-sorting.
+_INSORT_LIMIT = 1024
+
+
+def _int_key(key: str) -> Optional[int]:
+    """Integer form of `key` if it round-trips exactly ("0012" does not), else None."""
+    if key.isascii() and key.isdigit() and (key == "0" or key[0] != "0"):
+        value = int(key)
+        if value < _MAX_INT_KEY:
+            return value
+    return None
+
+
+class PartyDirectory:
+    def __init__(self, collections: Optional[List[str]] = None) -> None:
+        self.collections: List[str] = list(collections or [])
+        self._codes: Dict[str, int] = {c: i for i, c in enumerate(self.collections)}
+        self._ints = array("Q")      # sorted packed entries
+        self._pending = array("Q")   # appended since the last lookup
+        self._strs: Dict[str, int] = {}
+
+    # ------------------------------------------------------------------
+    # Mapping interface
+    # ------------------------------------------------------------------
+    def __setitem__(self, key: str, collection: str) -> None:
+        code = self._codes.get(collection)
+        if code is None:
+            if len(self.collections) > _CODE_MASK:
+                raise ValueError("PartyDirectory supports at most 256 collections")
+            code = self._codes[collection] = len(self.collections)
+            self.collections.append(collection)
+        value = _int_key(key)
+        if value is None:
+            self._strs[key] = code
+        else:
+            self._pending.append(value << 8 | code)
+
+    def get(self, key: str, default: Optional[str] = None) -> Optional[str]:
+        value = _int_key(key)
+        if value is None:
+            code = self._strs.get(key)
+            return default if code is None else self.collections[code]
+        if self._pending:
+            self._merge_pending()
+        ints = self._ints
+        i = bisect_left(ints, value << 8)
+        if i < len(ints) and ints[i] >> 8 == value:
+            return self.collections[ints[i] & _CODE_MASK]
+        return default
+
+    def __getitem__(self, key: str) -> str:
+        collection = self.get(key)
+        if collection is None:
+            raise KeyError(key)
+        return collection
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key) is not None
+
+    def __len__(self) -> int:
+        if self._pending:
+            self._merge_pending()
+        return len(self._ints) + len(self._strs)
+
+    def items(self) -> Iterator[Tuple[str, str]]:
+        if self._pending:
+            self._merge_pending()
+        for packed in self._ints:
+            yield str(packed >> 8), self.collections[packed & _CODE_MASK]
+        for key, code in self._strs.items():
+            yield key, self.collections[code]
+
+    def _merge_pending(self) -> None:
+        """Fold pending entries into the sorted array; a later entry for a key wins."""
+        pending, self._pending = self._pending, array("Q")
+        ints = self._ints
+        if len(pending) <= _INSORT_LIMIT:
+            for packed in pending:
+                i = bisect_left(ints, packed >> 8 << 8)
+                if i < len(ints) and ints[i] >> 8 == packed >> 8:
+                    ints[i] = packed
+                else:
+                    ints.insert(i, packed)
+            return
+        # Only the pending entries are sorted (stably, so the last one for a
+        # key wins); the directory itself is merged in one pass into a new
+        # array and never copied into a Python list.
+        batch = array("Q")
+        for packed in sorted(pending, key=lambda p: p >> 8):
+            if batch and batch[-1] >> 8 == packed >> 8:
+                batch[-1] = packed
+            else:
+                batch.append(packed)
+        del pending
+        out = array("Q")
+        i, n = 0, len(ints)
+        for packed in batch:
+            key = packed >> 8
+            while i < n and ints[i] >> 8 < key:
+                out.append(ints[i])
+                i += 1
+            if i < n and ints[i] >> 8 == key:
+                i += 1  # replaced by the pending entry
+            out.append(packed)
+        out.extend(ints[i:])
+        self._ints = out
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+    def save(self, path: str = PARTY_DIRECTORY_PATH) -> None:
+        """Write atomically: a JSON header line followed by the packed array."""
+        if self._pending:
+            self._merge_pending()
+        ints = self._ints
+        if sys.byteorder != "little":
+            ints = array("Q", ints)
+            ints.byteswap()
+        header = {
+            "version": FORMAT_VERSION,
+            "collections": self.collections,
+            "int_count": len(ints),
+            "str_keys": sorted(self._strs.items()),
+        }
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp = f"{path}.tmp"
+        with open(tmp, "wb") as f:
+            f.write(json.dumps(header, separators=(",", ":")).encode("utf-8") + b"\n")
+            ints.tofile(f)
+        os.replace(tmp, path)
+
+    @classmethod
+    def load(cls, path: str = PARTY_DIRECTORY_PATH) -> Optional["PartyDirectory"]:
+        """Read a saved directory, or return None if it is missing or another version."""
+        if not os.path.exists(path):
+            return None
+        with open(path, "rb") as f:
+            header = json.loads(f.readline())
+            if header.get("version") != FORMAT_VERSION:
+                return None
+            directory = cls(header["collections"])
+            directory._ints.fromfile(f, header["int_count"])
+        if sys.byteorder != "little":
+            directory._ints.byteswap()
+        directory._strs = {key: code for key, code in header["str_keys"]}
+        return directory
+
+
+def resolve_collections(db, keys, collections, directory: Optional[PartyDirectory] = None) -> Dict[str, str]:
+    """
+    Map each party key to the collection that holds it, checking only `keys`.
+
+    Keys the directory knows are verified at their recorded collection. Unknown
+    keys are probed in every collection. Both are fetched with a single
+    DOCUMENT() call; a second call re-probes only directory hits that turned out
+    to be stale. Keys found nowhere are absent from the result.
+    """
+    collections = [c for c in collections if db.has_collection(c)]
+
+    def _lookup(ids):
+        if not ids:
+            return {}
+        cursor = db.aql.execute("FOR d IN DOCUMENT(@ids) RETURN d._id", bind_vars={"ids": ids})
+        return {doc_id.split("/", 1)[1]: doc_id.split("/", 1)[0] for doc_id in cursor}
+
+    keys = sorted(set(keys))
+    hinted = {k: directory.get(k) for k in keys} if directory is not None else {}
+    ids = []
+    for key in keys:
+        hint = hinted.get(key)
+        ids += [f"{hint}/{key}"] if hint in collections else [f"{c}/{key}" for c in collections]
+    found = _lookup(ids)
+
+    stale = [k for k in keys if k not in found and hinted.get(k) in collections]
+    found.update(_lookup([f"{c}/{k}" for k in stale for c in collections if c != hinted[k]]))
+    return found
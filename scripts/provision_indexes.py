@@ -0,0 +1,202 @@
+"""
+provision_indexes.py
+
+Creates or reconciles the secondary indexes the pipeline and the Visualizer
+filter on, as declared in INDEX_MANIFEST. Idempotent: matching indexes are left
+alone, managed indexes (name prefix "ri_") whose definition changed are
+rebuilt, and managed indexes no longer in the manifest are dropped. Indexes
+created by hand or by other tools are never touched.
+
+Each saved Visualizer query (install_theme.VISUALIZER_QUERIES) and each hot
+pipeline query (pipeline_queries()) is EXPLAINed before and after provisioning,
+and the report lists the collection accesses that moved from a full
+collection scan to an index scan.
+
+Run:
+    python scripts/provision_indexes.py
+    python scripts/provision_indexes.py --dry-run   # explain + report only
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+from pathlib import Path
+from typing import Dict, List, Optional
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import apply_config_to_env, get_arango_config, load_dotenv, sanitize_url
+
+from arango import ArangoClient
+
+VERTEX_COLLECTIONS = ["Person", "Organization", "Vessel", "Aircraft"]
+EDGE_COLLECTIONS = ["owned_by", "family_member_of", "leader_of", "operates"]
+
+INDEX_PREFIX = "ri_"
+
+# Persistent indexes to maintain. dataSource is not sparse so that
+# `dataSource == null` (real OFAC documents) can use it too; the score and
+# level attributes only exist on scored documents, so those are sparse.
+INDEX_MANIFEST = [
+    {"name": "ri_dataSource_scenario", "collections": VERTEX_COLLECTIONS,
+     "fields": ["dataSource", "scenario"], "sparse": False},
+    {"name": "ri_riskScore", "collections": VERTEX_COLLECTIONS,
+     "fields": ["riskScore"], "sparse": True},
+    {"name": "ri_inferredRisk", "collections": VERTEX_COLLECTIONS,
+     "fields": ["inferredRisk"], "sparse": True},
+    {"name": "ri_riskLevel", "collections": VERTEX_COLLECTIONS,
+     "fields": ["riskLevel"], "sparse": True},
+    {"name": "ri_degreeTotal", "collections": VERTEX_COLLECTIONS,
+     "fields": ["degreeTotal"], "sparse": True},
+    {"name": "ri_dataSource", "collections": EDGE_COLLECTIONS,
+     "fields": ["dataSource"], "sparse": False},
+]
+
+# Hot filters issued by pipeline stages (representative forms of the real queries).
+def pipeline_queries() -> List[tuple]:
+    """(name, aql, bind_vars) for the pipeline queries, taken from the modules that run them."""
+    from degree_counters import SUPERNODE_MIN_DEGREE, SUPERNODES_QUERY
+    from generate_clean_portfolio import ANCHOR_QUERY, CLEAN_SOURCE, WIPE_QUERY
+    from load_data import SCAN_LOADED_QUERY
+    from load_synthetic_data import INIT_INFERRED_RISK_QUERY
+
+    return [
+        ("generate_clean_portfolio: wipe", WIPE_QUERY, {"@col": "Person", "s": CLEAN_SOURCE}),
+        ("generate_clean_portfolio: wipe edges", WIPE_QUERY, {"@col": "owned_by", "s": CLEAN_SOURCE}),
+        ("generate_clean_portfolio: anchors", ANCHOR_QUERY,
+         {"@col": "Organization", "s": CLEAN_SOURCE, "n": 4}),
+        ("degree_counters: supernodes", SUPERNODES_QUERY,
+         {"@col": "Organization", "min": SUPERNODE_MIN_DEGREE, "limit": 25}),
+        ("load_synthetic_data: init inferredRisk", INIT_INFERRED_RISK_QUERY, {"@col": "Person"}),
+        ("load_data --incremental: scan", SCAN_LOADED_QUERY, {"@col": "owned_by"}),
+    ]
+
+
+def _saved_queries() -> List[tuple]:
+    from install_theme import VISUALIZER_QUERIES
+
+    return [(f"visualizer: {key}", aql, {}) for key, _, aql, _ in VISUALIZER_QUERIES] + pipeline_queries()
+
+
+def _matches(index: dict, spec: dict) -> bool:
+    return (
+        index.get("type") == "persistent"
+        and list(index.get("fields", [])) == spec["fields"]
+        and bool(index.get("sparse")) == spec["sparse"]
+        and not index.get("unique")
+    )
+
+
+def provision(db, dry_run: bool = False) -> Dict[str, int]:
+    """Create missing, rebuild changed and drop retired managed indexes."""
+    totals = {"created": 0, "rebuilt": 0, "dropped": 0, "unchanged": 0}
+    wanted: Dict[str, Dict[str, dict]] = {}
+    for spec in INDEX_MANIFEST:
+        for col in spec["collections"]:
+            wanted.setdefault(col, {})[spec["name"]] = spec
+
+    for col, specs in wanted.items():
+        if not db.has_collection(col):
+            print(f"  [SKIP] {col}: collection does not exist")
+            continue
+        coll = db.collection(col)
+        existing = {ix.get("name"): ix for ix in coll.indexes()}
+        for name, spec in specs.items():
+            current = existing.get(name)
+            if current is not None and _matches(current, spec):
+                totals["unchanged"] += 1
+                continue
+            action = "rebuilt" if current is not None else "created"
+            print(f"  {col}.{name} {spec['fields']}{' sparse' if spec['sparse'] else ''}: {action}")
+            totals[action] += 1
+            if dry_run:
+                continue
+            if current is not None:
+                coll.delete_index(current["id"])
+            coll.add_index({"type": "persistent", "name": name, "fields": spec["fields"],
+                            "sparse": spec["sparse"], "inBackground": True})
+        for name, ix in existing.items():
+            if name and name.startswith(INDEX_PREFIX) and name not in specs:
+                print(f"  {col}.{name}: dropped (no longer in manifest)")
+                totals["dropped"] += 1
+                if not dry_run:
+                    coll.delete_index(ix["id"])
+    return totals
+
+
+def _collection_access(nodes: list, out: Dict[str, str]) -> Dict[str, str]:
+    """Map collection -> "full scan" or "index <names>" for every access in a plan."""
+    for node in nodes:
+        if node.get("type") == "EnumerateCollectionNode":
+            out.setdefault(node["collection"], "full scan")
+        elif node.get("type") == "IndexNode":
+            names = ",".join(ix.get("name") or ix.get("type", "?") for ix in node.get("indexes", []))
+            out[node["collection"]] = f"index {names}"
+        sub = node.get("subquery")
+        if sub:
+            _collection_access(sub.get("nodes", []), out)
+    return out
+
+
+def explain_access(db, queries) -> Dict[str, Optional[Dict[str, str]]]:
+    access = {}
+    for name, aql, bind_vars in queries:
+        try:
+            plan = db.aql.explain(aql, bind_vars=bind_vars)
+        except Exception:
+            access[name] = None  # e.g. a collection that does not exist yet
+            continue
+        access[name] = _collection_access(plan.get("nodes", []), {})
+    return access
+
+
+def report(before, after) -> None:
+    switched = 0
+    for name, plan_after in after.items():
+        plan_before = before.get(name)
+        if not plan_before or not plan_after:
+            continue
+        moved = [f"{col}: full scan -> {plan_after.get(col)}"
+                 for col, how in sorted(plan_before.items())
+                 if how == "full scan" and plan_after.get(col, "").startswith("index")]
+        if moved:
+            switched += 1
+            print(f"  {name}")
+            for line in moved:
+                print(f"    {line}")
+    still = sorted({col for plan in after.values() if plan
+                    for col, how in plan.items() if how == "full scan"})
+    print(f"  {switched} of {len(after)} queries switched to index scans")
+    if still:
+        print(f"  Collections still fully scanned somewhere: {', '.join(still)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create/reconcile pipeline secondary indexes")
+    parser.add_argument("--dry-run", action="store_true", help="Report planned changes without applying them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    cfg = get_arango_config()
+    apply_config_to_env(cfg)
+    print(f"Connecting to ArangoDB ({cfg.mode}): {sanitize_url(cfg.url)}")
+    print(f"Database: {cfg.database}\n")
+
+    client = ArangoClient(hosts=cfg.url)
+    db = client.db(cfg.database, username=cfg.username, password=cfg.password)
+
+    queries = _saved_queries()
+    before = explain_access(db, queries)
+
+    print("Reconciling indexes..." + (" (dry run)" if args.dry_run else ""))
+    totals = provision(db, dry_run=args.dry_run)
+    print("  " + ", ".join(f"{n} {k}" for k, n in totals.items()))
+
+    if args.dry_run:
+        return
+    print("\nQuery plans (EXPLAIN before -> after):")
+    report(before, explain_access(db, queries))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,369 @@
+"""
+resolve_entities.py
+
+Entity resolution (PRD §2.3): links parties that are the same real-world
+entity across sources and transliterations with `same_as` edges, and stamps
+each member of a resolved cluster with a shared `goldenId`.
+
+Comparing every pair is infeasible once more registries are loaded, so
+candidates are only compared inside blocks. Each party gets a few blocking
+keys, always scoped to its collection:
+
+  ph:<sorted Soundex codes of the name tokens>   transliterations, word order
+  tk:<name token>                                shared distinctive token
+  id:<type>:<value>                              shared identifier (passport, IMO, ...)
+
+Blocks larger than --max-block are skipped: a token shared by thousands of
+parties ("trading") carries no evidence. A pair in several blocks is scored
+only in the block with the smallest shared key, so no global de-duplication
+is needed and the blocks can be scored in a process pool (--workers).
+
+Pairs with a shared identifier match outright. Otherwise the score averages
+the string similarity of the normalised names and the overlap of their
+phonetic codes (names whose numbers differ never match), and pairs at or
+above --threshold match. Matches are
+clustered with union-find; the golden ID is "G-" plus the smallest member
+key. Parties are read from the loaded collections, so OFAC, synthetic,
+clean-portfolio and future registry documents are resolved together.
+Identifiers come from an optional `identifiers: [{type, value}]` attribute.
+The stage only writes changed edges and golden IDs, and removes stale ones.
+
+Run:
+    python scripts/resolve_entities.py
+    python scripts/resolve_entities.py --workers 8 --threshold 0.92 --dry-run
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import sys
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor
+from difflib import SequenceMatcher
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import RunMetrics, apply_config_to_env, get_arango_config, load_dotenv, relationship_key, sanitize_url
+
+from arango import ArangoClient
+
+VERTEX_COLLECTIONS = ["Person", "Organization", "Vessel", "Aircraft"]
+SAME_AS_COLLECTION = "same_as"
+GOLDEN_ID_FIELD = "goldenId"
+ER_SOURCE = "EntityResolution"
+
+DEFAULT_THRESHOLD = 0.9
+DEFAULT_MAX_BLOCK = 100
+MIN_TOKEN_LEN = 3
+# Candidate pairs per pool task: large enough to amortise pickling the blocks.
+PAIRS_PER_TASK = 50000
+
+# Tokens that say nothing about identity.
+STOP_TOKENS = {
+    "al", "el", "bin", "ibn", "bint", "abu", "de", "del", "la", "van", "von", "the", "and",
+    "llc", "ltd", "limited", "inc", "co", "corp", "corporation", "company", "jsc", "pjsc",
+    "ojsc", "cjsc", "fze", "fzco", "sa", "ag", "gmbh", "bv", "plc", "pte", "group",
+}
+_NON_ALNUM_RE = re.compile(r"[^a-z0-9]+")
+_SOUNDEX_CODES = {**dict.fromkeys("bfpv", "1"), **dict.fromkeys("cgjkqsxz", "2"),
+                  **dict.fromkeys("dt", "3"), "l": "4", **dict.fromkeys("mn", "5"), "r": "6"}
+
+# (party key, normalised name, phonetic codes, identifier keys, blocking keys)
+Record = Tuple[str, str, Tuple[str, ...], frozenset, frozenset]
+
+
+def name_tokens(name: str) -> List[str]:
+    """Lower-case ASCII tokens of `name` without diacritics, particles or legal forms."""
+    ascii_name = unicodedata.normalize("NFKD", name or "").encode("ascii", "ignore").decode("ascii")
+    return [t for t in _NON_ALNUM_RE.split(ascii_name.lower()) if t and t not in STOP_TOKENS]
+
+
+def soundex(token: str) -> str:
+    token = "".join(c for c in token if c.isalpha())
+    if not token:
+        return ""
+    out, last = token[0].upper(), _SOUNDEX_CODES.get(token[0], "")
+    for c in token[1:]:
+        code = _SOUNDEX_CODES.get(c, "")
+        if code and code != last:
+            out += code
+            if len(out) == 4:
+                break
+        if c not in "hw":
+            last = code
+    return out.ljust(4, "0")
+
+
+def identifier_key(id_type, value) -> str:
+    """"IMO", "IMO 9123456" and "imo", "9123456" give the same key."""
+    id_type = _NON_ALNUM_RE.sub("", str(id_type or "").lower())
+    value = _NON_ALNUM_RE.sub("", str(value).lower())
+    if id_type and value.startswith(id_type) and len(value) > len(id_type):
+        value = value[len(id_type):]
+    return f"id:{id_type}:{value}"
+
+
+def make_record(col: str, key: str, name: str, identifiers) -> Optional[Record]:
+    tokens = name_tokens(name)
+    id_keys = frozenset(
+        identifier_key(i.get("type"), i["value"])
+        for i in identifiers or () if isinstance(i, dict) and i.get("value")
+    )
+    if not tokens and not id_keys:
+        return None
+    phonetic = tuple(sorted(filter(None, (soundex(t) for t in tokens))))
+    keys = set(id_keys)
+    if phonetic:
+        keys.add("ph:" + ".".join(phonetic))
+    keys.update(f"tk:{t}" for t in tokens if len(t) >= MIN_TOKEN_LEN)
+    return (key, " ".join(sorted(tokens)), phonetic, id_keys,
+            frozenset(f"{col}|{k}" for k in keys))
+
+
+def score_pair(a: Record, b: Record) -> Tuple[float, str]:
+    if a[3] & b[3]:
+        return 1.0, "identifier"
+    if {t for t in a[1].split() if t.isdigit()} != {t for t in b[1].split() if t.isdigit()}:
+        return 0.0, "name"  # "SEA GLORY 7" and "SEA GLORY 42" are different hulls
+    ratio = SequenceMatcher(None, a[1], b[1]).ratio()
+    pa, pb = set(a[2]), set(b[2])
+    phonetic = len(pa & pb) / len(pa | pb) if pa or pb else 0.0
+    return (ratio + phonetic) / 2, "name"
+
+
+def _compare_blocks(args) -> List[Tuple[str, str, float, str]]:
+    """Score candidate pairs of a batch of blocks (runs in a pool worker)."""
+    blocks, threshold = args
+    matches = []
+    for block_key, members in blocks:
+        for i, a in enumerate(members):
+            for b in members[i + 1:]:
+                # Score each pair once: in the smallest block key the two share.
+                if min(a[4] & b[4]) != block_key:
+                    continue
+                score, method = score_pair(a, b)
+                if score >= threshold:
+                    first, second = sorted((a[0], b[0]))  # stable edge key across runs
+                    matches.append((first, second, round(score, 4), method))
+    return matches
+
+
+def build_blocks(records: List[Tuple[str, Record]], max_block: int) -> Tuple[List[tuple], Dict[str, int]]:
+    """Group records by blocking key; drop singleton and oversize blocks.
+
+    Member blocking keys are trimmed to the kept blocks, so the smallest
+    shared key of a pair is always a block the pair is actually scored in.
+    """
+    index: Dict[str, List[int]] = {}
+    for i, (_, rec) in enumerate(records):
+        for key in rec[4]:
+            index.setdefault(key, []).append(i)
+    stats = {"blocks": 0, "oversize": 0, "pairs": 0}
+    kept = {}
+    for key, members in index.items():
+        if len(members) < 2:
+            continue
+        if len(members) > max_block:
+            stats["oversize"] += 1
+            continue
+        kept[key] = members
+    trimmed = {}
+    blocks = []
+    for key in sorted(kept):
+        members = []
+        for i in kept[key]:
+            rec = trimmed.get(i)
+            if rec is None:
+                col, r = records[i]
+                rec = trimmed[i] = (f"{col}/{r[0]}", r[1], r[2], r[3], frozenset(k for k in r[4] if k in kept))
+            members.append(rec)
+        blocks.append((key, members))
+        stats["blocks"] += 1
+        stats["pairs"] += len(members) * (len(members) - 1) // 2
+    return blocks, stats
+
+
+def match_pairs(blocks: List[tuple], threshold: float, workers: int) -> Iterator[Tuple[str, str, float, str]]:
+    tasks, batch, pairs = [], [], 0
+    for block in blocks:
+        batch.append(block)
+        pairs += len(block[1]) * (len(block[1]) - 1) // 2
+        if pairs >= PAIRS_PER_TASK:
+            tasks.append((batch, threshold))
+            batch, pairs = [], 0
+    if batch:
+        tasks.append((batch, threshold))
+    if workers <= 1:
+        for task in tasks:
+            yield from _compare_blocks(task)
+        return
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for matches in pool.map(_compare_blocks, tasks):
+            yield from matches
+
+
+def golden_ids(pairs) -> Dict[str, str]:
+    """Union-find over matched (id, id) pairs -> {vertex id: golden ID}."""
+    parent: Dict[str, str] = {}
+
+    def find(x):
+        while parent.setdefault(x, x) != x:
+            parent[x] = parent[parent[x]]
+            x = parent[x]
+        return x
+
+    for a, b in pairs:
+        ra, rb = find(a), find(b)
+        if ra != rb:
+            parent[max(ra, rb)] = min(ra, rb)
+    clusters: Dict[str, List[str]] = {}
+    for v in parent:
+        clusters.setdefault(find(v), []).append(v)
+    out = {}
+    for members in clusters.values():
+        keys = [m.split("/", 1)[1] for m in members]
+        golden = "G-" + min(keys, key=lambda k: (not k.isdigit(), int(k) if k.isdigit() else 0, k))
+        out.update((m, golden) for m in members)
+    return out
+
+
+def read_records(db) -> Iterator[Tuple[str, Record]]:
+    for col in VERTEX_COLLECTIONS:
+        if not db.has_collection(col):
+            continue
+        cursor = db.aql.execute(
+            "FOR d IN @@col RETURN [d._key, d.primaryName || d.label, d.identifiers]",
+            bind_vars={"@col": col}, batch_size=10000, stream=True,
+        )
+        for key, name, identifiers in cursor:
+            rec = make_record(col, key, name or "", identifiers)
+            if rec is not None:
+                yield col, rec
+
+
+def write_same_as(db, matches, batch_size: int = 5000) -> Dict[str, int]:
+    """Upsert same_as edges for `matches` and remove the ones no longer matched."""
+    if not db.has_collection(SAME_AS_COLLECTION):
+        db.create_collection(SAME_AS_COLLECTION, edge=True)
+    coll = db.collection(SAME_AS_COLLECTION)
+    existing = {key: (score, method) for key, score, method in db.aql.execute(
+        "FOR e IN @@col RETURN [e._key, e.score, e.method]",
+        bind_vars={"@col": SAME_AS_COLLECTION}, batch_size=10000, stream=True)}
+    docs, keep = [], set()
+    for a, b, score, method in matches:
+        key = relationship_key(None, a, b, SAME_AS_COLLECTION)
+        keep.add(key)
+        if existing.get(key) != (score, method):
+            docs.append({"_key": key, "_from": a, "_to": b, "score": score, "method": method,
+                         "label": SAME_AS_COLLECTION, "dataSource": ER_SOURCE})
+    for i in range(0, len(docs), batch_size):
+        coll.import_bulk(docs[i:i + batch_size], on_duplicate="replace")
+    stale = sorted(set(existing) - keep)
+    for i in range(0, len(stale), batch_size):
+        db.aql.execute("FOR k IN @keys REMOVE k IN @@col OPTIONS { ignoreErrors: true }",
+                       bind_vars={"@col": SAME_AS_COLLECTION, "keys": stale[i:i + batch_size]})
+    return {"upserted": len(docs), "removed": len(stale), "unchanged": len(keep) - len(docs)}
+
+
+def write_golden_ids(db, golden: Dict[str, str], batch_size: int = 5000) -> Dict[str, int]:
+    """Set goldenId where it changed and clear it on parties no longer in a cluster."""
+    totals = {"set": 0, "cleared": 0}
+    for col in VERTEX_COLLECTIONS:
+        if not db.has_collection(col):
+            continue
+        current = {key: g for key, g in db.aql.execute(
+            f"FOR d IN @@col FILTER d.{GOLDEN_ID_FIELD} != null RETURN [d._key, d.{GOLDEN_ID_FIELD}]",
+            bind_vars={"@col": col}, batch_size=10000, stream=True)}
+        prefix = f"{col}/"
+        wanted = {vid[len(prefix):]: g for vid, g in golden.items() if vid.startswith(prefix)}
+        changes = [{"_key": k, GOLDEN_ID_FIELD: g} for k, g in wanted.items() if current.get(k) != g]
+        changes += [{"_key": k, GOLDEN_ID_FIELD: None} for k in current if k not in wanted]
+        for i in range(0, len(changes), batch_size):
+            db.aql.execute(
+                "FOR c IN @changes UPDATE c IN @@col OPTIONS { keepNull: false, ignoreErrors: true }",
+                bind_vars={"@col": col, "changes": changes[i:i + batch_size]})
+        totals["set"] += sum(1 for c in changes if c[GOLDEN_ID_FIELD] is not None)
+        totals["cleared"] += sum(1 for c in changes if c[GOLDEN_ID_FIELD] is None)
+    return totals
+
+
+def _add_to_knowledge_graph(db) -> None:
+    if not db.has_graph("KnowledgeGraph"):
+        return
+    g = db.graph("KnowledgeGraph")
+    if any(ed.get("edge_collection", ed.get("collection")) == SAME_AS_COLLECTION
+           for ed in g.edge_definitions()):
+        return
+    g.create_edge_definition(SAME_AS_COLLECTION, VERTEX_COLLECTIONS, VERTEX_COLLECTIONS)
+    print(f"  Added {SAME_AS_COLLECTION} to KnowledgeGraph")
+
+
+def resolve(db, threshold: float = DEFAULT_THRESHOLD, max_block: int = DEFAULT_MAX_BLOCK,
+            workers: int = 1, dry_run: bool = False, metrics: Optional[RunMetrics] = None) -> None:
+    metrics = metrics or RunMetrics("resolve_entities")
+    with metrics.stage("read"):
+        records = []
+        for col, rec in read_records(db):
+            records.append((col, rec))
+            metrics.count("parties")
+    print(f"Read {len(records)} parties")
+
+    with metrics.stage("block"):
+        blocks, stats = build_blocks(records, max_block)
+    del records
+    print(f"Blocking: {stats['blocks']} blocks, {stats['pairs']} candidate pairs "
+          f"({stats['oversize']} blocks over {max_block} members skipped)")
+
+    with metrics.stage("compare"):
+        matches = sorted(match_pairs(blocks, threshold, workers))
+        metrics.count("candidate pairs", stats["pairs"])
+    del blocks
+    golden = golden_ids((a, b) for a, b, _, _ in matches)
+    by_method = {}
+    for *_, method in matches:
+        by_method[method] = by_method.get(method, 0) + 1
+    print(f"Matched {len(matches)} pairs ({', '.join(f'{n} by {m}' for m, n in sorted(by_method.items())) or 'none'}) "
+          f"into {len(set(golden.values()))} golden records covering {len(golden)} parties")
+
+    if dry_run:
+        for a, b, score, method in matches[:20]:
+            print(f"  {score:.3f} {method:<10} {a} = {b}")
+        return
+    with metrics.stage("write"):
+        edges = write_same_as(db, matches)
+        ids = write_golden_ids(db, golden)
+        _add_to_knowledge_graph(db)
+    print(f"  {SAME_AS_COLLECTION}: {edges['upserted']} upserted, {edges['removed']} removed, "
+          f"{edges['unchanged']} unchanged")
+    print(f"  {GOLDEN_ID_FIELD}: {ids['set']} set, {ids['cleared']} cleared")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Resolve parties into golden records with same_as links")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD,
+                        help=f"Minimum match score for name-based matches (default: {DEFAULT_THRESHOLD})")
+    parser.add_argument("--max-block", type=int, default=DEFAULT_MAX_BLOCK,
+                        help=f"Skip blocks with more members than this (default: {DEFAULT_MAX_BLOCK})")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="Score blocks in a pool of N processes (default: 1, serial)")
+    parser.add_argument("--dry-run", action="store_true", help="Report matches without writing them")
+    args = parser.parse_args()
+
+    load_dotenv()
+    cfg = get_arango_config()
+    apply_config_to_env(cfg)
+    print(f"Connecting to ArangoDB ({cfg.mode}): {sanitize_url(cfg.url)}")
+    print(f"Database: {cfg.database}\n")
+    client = ArangoClient(hosts=cfg.url)
+    db = client.db(cfg.database, username=cfg.username, password=cfg.password)
+
+    metrics = RunMetrics("resolve_entities", threshold=args.threshold, max_block=args.max_block,
+                         workers=args.workers)
+    resolve(db, args.threshold, args.max_block, max(1, args.workers), args.dry_run, metrics)
+    metrics.write()
+
+
+if __name__ == "__main__":
+    main()
@@ -4,42 +4,54 @@ Master pipeline runner for risk-intelligence.
 
 Runs all pipeline stages in order:
   1. load_data               – ingest ontology, real OFAC parties/relationships, synthetic fixtures
-  2. calculate_direct_risk   – score entities from OFAC XML
-  3. generate_clean_portfolio – add clean counterparties + sanctioned-exposure hotspots
-  4. calculate_inferred_risk  – propagate risk through the graph
-  5. install_theme           – push themes and canvas actions to the Visualizer
+  2. provision_indexes       – create/reconcile secondary indexes (runs with data or risk stages)
+  3. calculate_direct_risk   – score entities from OFAC XML
+  4. generate_clean_portfolio – add clean counterparties + sanctioned-exposure hotspots
+  5. calculate_inferred_risk  – propagate risk through the graph
+  6. install_theme           – push themes and canvas actions to the Visualizer
+  (optional) resolve_entities – same_as links + golden IDs, after the indexes (--resolve-entities)
 
 Usage:
     python scripts/run_pipeline.py              # full pipeline
     python scripts/run_pipeline.py --skip-data  # re-score + re-theme an existing dataset
+    python scripts/run_pipeline.py --from-xml   # load straight from the OFAC XML (no CSV step)
+    python scripts/run_pipeline.py --incremental  # upsert only changed parties/relationships
+    python scripts/run_pipeline.py --resolve-entities  # also link duplicates into golden records
     python scripts/run_pipeline.py --only-themes
 """
 
+from __future__ import annotations
+
 import argparse
 import subprocess
 import sys
 from pathlib import Path
 
 SCRIPTS_DIR = Path(__file__).parent
+sys.path.insert(0, str(SCRIPTS_DIR.resolve()))
+from common import RunMetrics
 
 # Ordered pipeline stages: (script_stem, human-readable description)
 STAGES = [
     ("load_data",                "Load ontology, parties & synthetic fixtures"),
+    ("provision_indexes",        "Create/reconcile secondary indexes"),
     ("calculate_direct_risk",    "Calculate direct risk scores from OFAC data"),
     ("generate_clean_portfolio", "Generate clean counterparties & exposure hotspots"),
     ("calculate_inferred_risk",  "Propagate inferred risk through the graph"),
     ("install_theme",            "Install Visualizer themes & canvas actions"),
 ]
+# Opt-in stage (--resolve-entities), run right after provision_indexes.
+ER_STAGE = ("resolve_entities", "Resolve entities into golden records (same_as)")
 
 
-def _run(script_stem: str, description: str) -> bool:
+def _run(script_stem: str, description: str, extra_args: list[str] | None = None) -> bool:
     script = SCRIPTS_DIR / f"{script_stem}.py"
     print(f"\n{'='*62}")
     print(f"  STEP: {description}")
-    print(f"  script: {script.name}")
+    print(f"  script: {script.name} {' '.join(extra_args or [])}".rstrip())
     print(f"{'='*62}")
     result = subprocess.run(
-        [sys.executable, str(script)],
+        [sys.executable, str(script), *(extra_args or [])],
         cwd=SCRIPTS_DIR.parent,
     )
     if result.returncode != 0:
@@ -62,6 +74,42 @@ def main() -> None:
         action="store_true",
         help="Skip load_data (assume collections already populated)",
     )
+    parser.add_argument(
+        "--from-xml",
+        action="store_true",
+        help="Have load_data stream parties/relationships straight from the OFAC XML",
+    )
+    parser.add_argument(
+        "--incremental",
+        action="store_true",
+        help="Have load_data upsert only changed documents instead of truncating collections",
+    )
+    parser.add_argument(
+        "--virtual-typing",
+        action="store_true",
+        help="Have load_data skip per-instance type edges (class comes from the CollectionClass lookup)",
+    )
+    parser.add_argument(
+        "--transaction-size",
+        type=int,
+        default=0,
+        help="Have load_data commit in stream transactions of about this many documents",
+    )
+    parser.add_argument(
+        "--force-load",
+        action="store_true",
+        help="Have load_data reload even when its inputs are unchanged since the last load",
+    )
+    parser.add_argument(
+        "--risk-changes-only",
+        action="store_true",
+        help="Have calculate_direct_risk write only changed scores and save a change report",
+    )
+    parser.add_argument(
+        "--resolve-entities",
+        action="store_true",
+        help="Also run resolve_entities (same_as links + goldenId) after the indexes",
+    )
     parser.add_argument(
         "--skip-risk",
         action="store_true",
@@ -86,11 +134,16 @@ def main() -> None:
     selected: list[tuple[str, str]] = []
     if not args.skip_data:
         selected.append(STAGES[0])
+    if not (args.skip_data and args.skip_risk):
+        # Idempotent; the risk stages' filters depend on these indexes.
+        selected.append(STAGES[1])
+    if args.resolve_entities:
+        selected.append(ER_STAGE)
     if not args.skip_risk:
         # direct risk -> clean portfolio (depends on anchors) -> inferred propagation
-        selected += STAGES[1:4]
+        selected += STAGES[2:5]
     if not args.skip_themes:
-        selected.append(STAGES[4])
+        selected.append(STAGES[5])
 
     if not selected:
         print("No stages selected — all stages were skipped. Use --help to see options.")
@@ -99,15 +152,29 @@ def main() -> None:
     total = len(selected)
     print(f"\nPipeline: {total} stage(s) selected")
 
+    load_args = [flag for flag, on in (("--from-xml", args.from_xml),
+                                       ("--incremental", args.incremental),
+                                       ("--virtual-typing", args.virtual_typing),
+                                       ("--force", args.force_load)) if on]
+    if args.transaction_size > 0:
+        load_args += ["--transaction-size", str(args.transaction_size)]
+    stage_args = {"load_data": load_args,
+                  "calculate_direct_risk": ["--changed-only"] if args.risk_changes_only else []}
+    metrics = RunMetrics("run_pipeline", stages=[stem for stem, _ in selected])
+
     for i, (stem, desc) in enumerate(selected, 1):
         print(f"\n[{i}/{total}]", end="")
-        if not _run(stem, desc):
+        with metrics.stage(stem):
+            ok = _run(stem, desc, stage_args.get(stem))
+        if not ok:
             print(f"\nPipeline aborted at stage {i}/{total}: {stem}", file=sys.stderr)
+            metrics.write()
             sys.exit(1)
 
     print(f"\n{'='*62}")
     print("  Pipeline complete!")
     print(f"{'='*62}\n")
+    metrics.write()
 
 
 if __name__ == "__main__":
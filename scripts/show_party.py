@@ -0,0 +1,55 @@
+"""
+show_party.py
+
+Prints the full OFAC record (aliases, features) for one or more parties by
+FixedRef, reading only those DistinctParty elements from data/SDN_ADVANCED.XML
+via the byte-offset index that flatten_ofac.py writes to data/party_index.csv.
+
+Run:
+    python scripts/show_party.py 15117
+    python scripts/show_party.py 15117 17018 --raw   # raw XML instead of JSON
+    python scripts/show_party.py 15117 --xml data/archive/SDN_2025.XML --index data/archive/party_index.csv
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+from common import is_compressed_xml
+from flatten_ofac import PARTY_INDEX_CSV, XML_PATH, load_party_index, party_details, read_party_element
+
+from lxml import etree
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Show full OFAC party records by FixedRef")
+    parser.add_argument("party_ids", nargs="+", help="OFAC FixedRef / party _key")
+    parser.add_argument("--raw", action="store_true", help="Print the raw DistinctParty XML")
+    parser.add_argument("--xml", default=XML_PATH,
+                        help=f"OFAC XML the index was built from, uncompressed (default: {XML_PATH})")
+    parser.add_argument("--index", default=PARTY_INDEX_CSV,
+                        help=f"Party index written by flatten_ofac.py for --xml (default: {PARTY_INDEX_CSV})")
+    args = parser.parse_args()
+
+    # Byte offsets only address the plain file.
+    if is_compressed_xml(args.xml):
+        parser.error(f"{args.xml} is compressed; the party index needs the uncompressed XML")
+
+    index = load_party_index(args.index)
+    for party_id in args.party_ids:
+        elem = read_party_element(party_id, index=index, xml_path=args.xml)
+        if elem is None:
+            print(f"[MISSING] {party_id} is not in {args.index}", file=sys.stderr)
+            continue
+        if args.raw:
+            print(etree.tostring(elem, pretty_print=True, encoding="unicode"))
+        else:
+            print(json.dumps(party_details(elem), indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()